@@ -30,8 +30,11 @@ export async function POST(request: NextRequest) {
       requestBody = { key: body.key };
     }
     
+    // Job status polls (jobs/<id>) are read-only GETs on the EC2 API
+    const method = endpoint.startsWith('jobs/') ? 'GET' : 'POST';
+    
     const url = `${EC2_API_URL}/api/${endpoint}`;
-    console.log('Forwarding request to:', url);
+    console.log(`Forwarding ${method} request to:`, url);
     
     // Use the hardcoded API key
     const authHeader = `Bearer ${API_KEY}`;
@@ -39,12 +42,12 @@ export async function POST(request: NextRequest) {
     
     // Forward the request to the EC2 API
     const response = await fetch(url, {
-      method: 'POST',
+      method,
       headers: {
         'Content-Type': 'application/json',
         'Authorization': authHeader
       },
-      body: Object.keys(requestBody).length > 0 ? JSON.stringify(requestBody) : undefined
+      body: method === 'POST' && Object.keys(requestBody).length > 0 ? JSON.stringify(requestBody) : undefined
     });
     
     console.log('EC2 API response status:', response.status);
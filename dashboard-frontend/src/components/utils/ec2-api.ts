@@ -2,6 +2,63 @@
  * Client for interacting with the EC2 backend API
  */
 
+// How often and how long to poll a background refresh job
+const JOB_POLL_INTERVAL_MS = 2000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
+/**
+ * Poll a background job on the EC2 server until it finishes
+ * @param jobId Id returned by the endpoint that started the job
+ * @returns Promise with the job result
+ */
+async function waitForJob(jobId: string): Promise<{
+  success: boolean;
+  error?: string;
+  message?: string;
+}> {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+  
+  while (Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    
+    const response = await fetch('/api/proxy', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify({ endpoint: `jobs/${jobId}` })
+    });
+    
+    const data = await response.json();
+    const job = data.job;
+    if (!job) {
+      return {
+        success: false,
+        error: data.error || 'JOB_ERROR',
+        message: data.message || 'Could not read the update status'
+      };
+    }
+    
+    console.log(`Job ${jobId} is ${job.status} (stage: ${job.stage})`);
+    if (job.status === 'succeeded') {
+      return { success: true, message: 'Dashboard updated' };
+    }
+    if (job.status === 'failed') {
+      return {
+        success: false,
+        error: job.error?.code || 'JOB_FAILED',
+        message: job.error?.message || 'Dashboard update failed'
+      };
+    }
+  }
+  
+  return {
+    success: false,
+    error: 'TIMEOUT',
+    message: 'Dashboard update did not finish in time'
+  };
+}
+
 /**
  * Trigger the dashboard update process on the EC2 server
  * @returns Promise with the update result
@@ -43,6 +100,11 @@ export async function triggerDashboardUpdate(): Promise<{
         };
       }
       
+      // The update runs in the background; wait for it to finish
+      if (data.success && data.job_id) {
+        return await waitForJob(data.job_id);
+      }
+      
       // For other responses
       return data;
     // eslint-disable-next-line @typescript-eslint/no-unused-vars
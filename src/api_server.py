@@ -1,57 +1,96 @@
 import os
-import json
-import subprocess
-from flask import Flask, request, jsonify
+import sys
+from datetime import datetime, timezone
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Make the src package importable when started as src/api_server.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.collectors.bucketlister import get_bucketlister_data, session_keys, sync_window, try_session_key
+from src.collectors.bucketlister_session import decode_session, session_expiry
+from src.main import collect_and_process_data, push_to_dashboard, summarize_run
+from src.utils.jobs import JobRunner
+from src.utils.snapshot import LatestMetrics
+from src.utils.state import RunLock
+
 app = Flask(__name__)
 CORS(app)
 
 # Secret key for authentication
 API_KEY = os.environ.get('API_KEY', 'default-secret-key')
 
-# Path to the update script
-UPDATE_SCRIPT_PATH = os.path.join(os.path.dirname(__file__), 'run_update.py')
+# Refreshes run on a background worker inside this process; concurrent
+# triggers share one run, and the lock keeps cron runs from overlapping them
+jobs = JobRunner()
+refresh_lock = RunLock('refresh')
+
+# Last computed metrics, written by every pipeline run (API jobs and cron)
+latest_metrics = LatestMetrics()
+
+class KeyCheckError(Exception):
+    """Raised when Bucketlister rejects the session key"""
+    code = 'KEY_ERROR'
+
+def _authorized() -> bool:
+    auth_header = request.headers.get('Authorization', '')
+    return auth_header.startswith('Bearer ') and auth_header[7:] == API_KEY
+
+def _session_unusable() -> bool:
+    # Cheap local check: an expired session without a refresh token cannot work
+    key = session_keys.get()
+    expiry = session_expiry(key)
+    expired = expiry is not None and expiry <= datetime.now(timezone.utc)
+    return expired and not decode_session(key).get('refreshToken')
+
+def _refresh_stages():
+    """Stages of a dashboard refresh: key check, collection, push"""
+    state = {}
+    
+    def check_key():
+        data = get_bucketlister_data(*sync_window())
+        if not data or 'error' in data:
+            raise KeyCheckError("Invalid or expired Bucketlister session key")
+    
+    def collect():
+        state['metrics'] = collect_and_process_data()
+    
+    def push():
+        push_to_dashboard(state['metrics'])
+        return summarize_run(state['metrics'])
+    
+    return [('key_check', check_key), ('collect', collect), ('push', push)]
+
+def _accepted(job_id: str, message: str):
+    return jsonify({
+        'success': True,
+        'message': message,
+        'job_id': job_id,
+        'status_url': f"/api/jobs/{job_id}"
+    }), 202
 
 @app.route('/api/update-dashboard', methods=['POST'])
 def update_dashboard():
     # Check for API key
-    auth_header = request.headers.get('Authorization', '')
-    if not auth_header.startswith('Bearer ') or auth_header[7:] != API_KEY:
+    if not _authorized():
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     try:
-        # Run the update script
-        result = subprocess.run(['python3', UPDATE_SCRIPT_PATH], 
-                               capture_output=True, 
-                               text=True, 
-                               check=True)
-        
-        # If script ran successfully
-        return jsonify({
-            'success': True,
-            'message': 'Dashboard updated successfully',
-            'output': result.stdout
-        })
-    except subprocess.CalledProcessError as e:
-        # If script failed due to key error
-        if 'KEY_ERROR' in e.stderr:
+        # Only the cheap local check runs here; the job's key_check stage
+        # reports a key Bucketlister rejects, and the dashboard polls for it
+        if _session_unusable():
             return jsonify({
                 'success': False,
                 'error': 'KEY_ERROR',
                 'message': 'Update failed due to invalid key'
             }), 400
-        # If script failed for other reasons
-        return jsonify({
-            'success': False,
-            'error': 'UPDATE_FAILED',
-            'message': 'Update script failed to execute',
-            'details': e.stderr
-        }), 500
+        
+        job_id = jobs.submit('update-dashboard', _refresh_stages(), coalesce_key='refresh', run_lock=refresh_lock)
+        return _accepted(job_id, 'Dashboard update started')
     except Exception as e:
         return jsonify({
             'success': False,
@@ -62,8 +101,7 @@ def update_dashboard():
 @app.route('/api/validate-key', methods=['POST'])
 def validate_key():
     # Check for API key
-    auth_header = request.headers.get('Authorization', '')
-    if not auth_header.startswith('Bearer ') or auth_header[7:] != API_KEY:
+    if not _authorized():
         return jsonify({'success': False, 'error': 'Unauthorized'}), 401
     
     try:
@@ -78,29 +116,17 @@ def validate_key():
         
         new_key = data['key']
         
-        # Update the key in bucketlister.py
-        from collectors.bucketlister import update_session_key
-        update_session_key(new_key)
-        
-        # Run the update script again
-        result = subprocess.run(['python3', UPDATE_SCRIPT_PATH], 
-                               capture_output=True, 
-                               text=True, 
-                               check=True)
+        # Check the key before storing it, so a rejected key never replaces a
+        # working one; once stored, collectors in every process pick it up
+        if not try_session_key(new_key, *sync_window()):
+            return jsonify({
+                'success': False,
+                'error': 'KEY_ERROR',
+                'message': 'The new key was rejected by Bucketlister'
+            }), 400
         
-        # If script ran successfully after key update
-        return jsonify({
-            'success': True,
-            'message': 'Key updated and dashboard refreshed successfully',
-            'output': result.stdout
-        })
-    except subprocess.CalledProcessError as e:
-        return jsonify({
-            'success': False,
-            'error': 'UPDATE_FAILED',
-            'message': 'Update script failed even after key update',
-            'details': e.stderr
-        }), 500
+        job_id = jobs.submit('validate-key', _refresh_stages(), coalesce_key='refresh', run_lock=refresh_lock)
+        return _accepted(job_id, 'Key updated, dashboard refresh started')
     except Exception as e:
         return jsonify({
             'success': False,
@@ -108,6 +134,43 @@ def validate_key():
             'message': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    # Check for API key
+    if not _authorized():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+    
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'NOT_FOUND', 'message': 'Unknown job id'}), 404
+    return jsonify({'success': job['status'] != 'failed', 'job': job})
+
+@app.route('/api/metrics/latest', methods=['GET'])
+def get_latest_metrics():
+    # Check for API key
+    if not _authorized():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+    
+    snapshot = latest_metrics.get()
+    if snapshot is None:
+        return jsonify({'success': False, 'error': 'NOT_FOUND', 'message': 'No metrics have been computed yet'}), 404
+    
+    # Quality-aware, so 'gzip;q=0' opts out of gzip
+    use_gzip = request.accept_encodings['gzip'] > 0
+    etag = snapshot['gzip_etag'] if use_gzip else snapshot['etag']
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    
+    # If-None-Match uses weak comparison (RFC 7232), so W/"<etag>" matches too
+    if_none_match = request.headers.get('If-None-Match', '')
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    if if_none_match.strip() == '*' or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]:
+        return Response(status=304, headers=headers)
+    
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(snapshot['gzip_body'], mimetype='application/json', headers=headers)
+    return Response(snapshot['body'], mimetype='application/json', headers=headers)
+
 if __name__ == '__main__':
     # Get port from environment variable
     port = int(os.environ.get('PORT', 5000))
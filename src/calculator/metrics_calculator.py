@@ -5,9 +5,9 @@ Metrics calculator for combining and processing data from all sources
 from typing import Dict, Any, List
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from src.collectors.divvy_index import SpendIndex
 from src.utils.logger import setup_logger
 from src.utils.marketing import get_influencer_spend, get_historical_spend
-import json
 
 logger = setup_logger('metrics_calculator')
 
@@ -26,7 +26,7 @@ class MetricsCalculator:
         self.influencer_spend = get_influencer_spend()
         self.historical_spend = get_historical_spend()
         
-    def calculate_metrics(self, fb_data: Dict[str, Any], luma_data: Dict[str, Any], bucketlister_tickets: Dict[str, int], divvy_data: Dict[str, Any]) -> Dict[str, Any]:
+    def calculate_metrics(self, fb_data: Dict[str, Any], luma_data: Dict[str, Any], bucketlister_tickets: Dict[str, int], divvy_data: Dict[str, Any], bucketlister_experiences: Dict[str, Dict[str, int]] = None) -> Dict[str, Any]:
         """
         Calculate combined metrics from all data sources
         
@@ -35,6 +35,7 @@ class MetricsCalculator:
             luma_data: Data from Luma collector
             bucketlister_tickets: Dictionary of daily tickets sold from Bucketlister
             divvy_data: Data from Divvy collector
+            bucketlister_experiences: Optional daily tickets sold per Bucketlister experience
             
         Returns:
             Dict containing calculated metrics
@@ -74,10 +75,7 @@ class MetricsCalculator:
             operational_expenses = divvy_data.get('total_spend', 0)
             self.logger.info(f"Total operational expenses from Divvy: ${operational_expenses:.2f}")
             
-            # Add debug logging for Divvy data
-            self.logger.info("Divvy data received:")
-            self.logger.info(f"Raw Divvy data: {json.dumps(divvy_data, indent=2)}")
-            self.logger.info(f"Operational expenses type: {type(operational_expenses)}")
+            self.logger.info(f"Divvy transactions: {divvy_data.get('transaction_count', 0)} across {len(divvy_data.get('spend_by_category', {}))} categories")
             
             # Log spend breakdown
             self.logger.info(f"Facebook Ads spend: ${fb_spend:.2f}")
@@ -90,6 +88,8 @@ class MetricsCalculator:
             self.logger.info("\nFacebook Ads Status:")
             self.logger.info(f"Total Ads: {fb_data['total_ads_count']}")
             self.logger.info(f"Active Ads: {fb_data['active_ads_count']}")
+            if fb_data.get('api_usage'):
+                self.logger.info(f"API Utilization: {fb_data['api_usage']['utilization']}% (peak {fb_data['api_usage']['peak_utilization']}%)")
             
             # Prepare final data structure with ET timestamp
             metrics = {
@@ -114,9 +114,18 @@ class MetricsCalculator:
                     'active_ads_count': fb_data['active_ads_count'],
                     'total_impressions': fb_data['total_impressions'],
                     'total_clicks': fb_data['total_clicks'],
-                    'ads': fb_data['ads']
+                    'ads': fb_data['ads'],
+                    'daily_spend': fb_data.get('daily_spend', []),
+                    'api_usage': fb_data.get('api_usage', {})
                 },
-                'dailyMetrics': self._prepare_daily_breakdown(daily_metrics, bucketlister_tickets)
+                'divvy_metrics': self._prepare_divvy_breakdown(divvy_data),
+                'bucketlister_metrics': {
+                    'tickets_by_experience': {
+                        name: sum(daily.values()) for name, daily in (bucketlister_experiences or {}).items()
+                    },
+                    'daily_by_experience': bucketlister_experiences or {}
+                },
+                'dailyMetrics': self._prepare_daily_breakdown(daily_metrics, bucketlister_tickets, fb_data.get('daily_spend', []))
             }
             
             if self._validate_metrics(metrics):
@@ -163,11 +172,14 @@ class MetricsCalculator:
         
         return daily_metrics
     
-    def _prepare_daily_breakdown(self, daily_metrics: List[Dict[str, Any]], bucketlister_data: Dict[str, int]) -> List[Dict[str, Any]]:
+    def _prepare_daily_breakdown(self, daily_metrics: List[Dict[str, Any]], bucketlister_data: Dict[str, int], fb_daily_spend: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Prepare final daily breakdown for Dashboard"""
         # Create a dictionary of all dates from Luma data
         daily_by_date = {day['date']: day for day in daily_metrics}
         
+        # Facebook Ads spend per day, when the collector keeps a daily store
+        paid_spend_by_date = {day['date']: day['spend'] for day in (fb_daily_spend or [])}
+        
         # Get all unique dates from both sources
         all_dates = sorted(set(list(daily_by_date.keys()) + list(bucketlister_data.keys())))
         
@@ -218,11 +230,33 @@ class MetricsCalculator:
                 'netRevenue': accumulated_revenue_after_fees,  # Now showing accumulated net revenue
                 'accumulatedNet': accumulated_revenue_after_fees,  # This field is now redundant but keeping for backward compatibility
                 'dailyGuests': luma_day['daily_guests'] + bucketlister_daily_guests,
-                'accumulatedGuests': accumulated_guests
+                'accumulatedGuests': accumulated_guests,
+                'paidAdsSpend': paid_spend_by_date.get(date, 0)
             })
         
         return breakdown
     
+    def _prepare_divvy_breakdown(self, divvy_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Prepare operational expense drill-downs from the Divvy spend index
+        
+        Args:
+            divvy_data: Data from Divvy collector
+            
+        Returns:
+            Dict of top merchants and categories for the whole window and the
+            current month
+        """
+        index = SpendIndex.from_rows(divvy_data.get('spend_index', []))
+        month_start = datetime.now(self.timezone).date().replace(day=1).isoformat()
+        
+        return {
+            'top_merchants': index.top_merchants(10),
+            'top_categories': index.top_categories(10),
+            'top_merchants_this_month': index.top_merchants(10, start=month_start),
+            'top_categories_this_month': index.top_categories(10, start=month_start)
+        }
+
     def _validate_metrics(self, metrics: Dict[str, Any]) -> bool:
         """Validate calculated metrics"""
         try:
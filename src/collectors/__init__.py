@@ -3,22 +3,62 @@ Data collectors for different sources
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any
-from .divvy_collector import DivvyCollector
+from typing import Dict, Any, Optional
+
+from src.config import Config
+from src.utils.http import run_sync
+from src.utils.projection import project
 
 class DataCollector(ABC):
     """Base interface for all data collectors"""
     
-    @abstractmethod
+    # Mask of the output fields consumed downstream (see utils.projection);
+    # None keeps the whole output
+    output_fields: Optional[Dict[str, Any]] = None
+    
     def collect(self) -> Dict[str, Any]:
         """
         Collect data from the source
         
+        Thin synchronous wrapper around acollect() for callers without an
+        event loop of their own.
+        
+        Returns:
+            Dict[str, Any]: Collected data in a standardized format
+        """
+        return run_sync(self.acollect())
+    
+    @abstractmethod
+    async def acollect(self) -> Dict[str, Any]:
+        """
+        Collect data from the source on the running event loop
+        
         Returns:
             Dict[str, Any]: Collected data in a standardized format
         """
         pass
     
+    @property
+    def include_raw(self) -> bool:
+        """Whether project() keeps the whole output, raw payloads included"""
+        return self.output_fields is None or Config.get_pipeline_config()['include_raw']
+    
+    def project(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Drop the output fields no downstream consumer uses
+        
+        Raw payloads are kept when PIPELINE_INCLUDE_RAW is set.
+        
+        Args:
+            data (Dict[str, Any]): Validated collector output
+            
+        Returns:
+            Dict[str, Any]: Output restricted to output_fields
+        """
+        if self.include_raw:
+            return data
+        return project(data, self.output_fields)
+    
     @abstractmethod
     def validate_data(self, data: Dict[str, Any]) -> bool:
         """
@@ -32,4 +72,6 @@ class DataCollector(ABC):
         """
         pass
 
+from .divvy_collector import DivvyCollector
+
 __all__ = ['DataCollector', 'DivvyCollector']
@@ -1,32 +1,238 @@
+import hashlib
+import threading
 import requests
-import re
-import os
+from datetime import date, datetime, timezone
+from typing import Dict, Any, Optional
+
+from src.collectors import DataCollector
+from src.collectors.bucketlister_store import BucketlisterIntervalStore
+from src.collectors.bucketlister_session import SessionKeyStore, decode_session, session_expiry
+from src.config import Config
+from src.utils.cache import get_response_cache
+from src.utils.http import get_session, run_blocking
+from src.utils.logger import setup_logger
+
+logger = setup_logger('bucketlister')
 
 url = "https://insights.bucketlisters.com/v2/1045/?_data=routes%2Fv2%2F%24partnerId%2Findex"
 
-# Only include the BLT_partner_session cookie
-cookies = {
-    "BLT_partner_session": "eyJ0b2tlbiI6ImV5SmhiR2NpT2lKSVV6VXhNaUo5LmV5SnpkV0lpT2lJeE1USTRNemt3SWl3aVlYVjBhQ0k2SWxKUFRFVmZWVk5GVWl4U1QweEZYMUJCVWxST1JWSmZRVVJOU1U0c1VrOU1SVjlRUVZKVVRrVlNYMEpCVTBsRElpd2ljSEowYm5JaU9pSXhNRFExSWl3aVpYaHdJam94TnpRd05UTXlNVFEwZlEuSEpIU09qbGJIT2xfRm1uLUtRMXg4cFV3VTBKM0huQVFJeFlOTi1TQ29INWEwbVNGSFFYdG1GX04xcE9yYVMzMjYwdmNrSnVlLTN3bTctU3NQTk9oMWciLCJyZWZyZXNoVG9rZW4iOiJkZWRjNWZlMWUxMTk0NTRjYjdjOWY5ZGJjYjYzMjhlZSJ9.DtlpP7c0S0XGGAdFOMmwfE5FabZ1lUzV3S19NfZ125Y"
-}
+# Session key used until one is stored through update_session_key
+DEFAULT_SESSION_KEY = "eyJ0b2tlbiI6ImV5SmhiR2NpT2lKSVV6VXhNaUo5LmV5SnpkV0lpT2lJeE1USTRNemt3SWl3aVlYVjBhQ0k2SWxKUFRFVmZWVk5GVWl4U1QweEZYMUJCVWxST1JWSmZRVVJOU1U0c1VrOU1SVjlRUVZKVVRrVlNYMEpCVTBsRElpd2ljSEowYm5JaU9pSXhNRFExSWl3aVpYaHdJam94TnpRd05UTXlNVFEwZlEuSEpIU09qbGJIT2xfRm1uLUtRMXg4cFV3VTBKM0huQVFJeFlOTi1TQ29INWEwbVNGSFFYdG1GX04xcE9yYVMzMjYwdmNrSnVlLTN3bTctU3NQTk9oMWciLCJyZWZyZXNoVG9rZW4iOiJkZWRjNWZlMWUxMTk0NTRjYjdjOWY5ZGJjYjYzMjhlZSJ9.DtlpP7c0S0XGGAdFOMmwfE5FabZ1lUzV3S19NfZ125Y"
+
+session_keys = SessionKeyStore(default=DEFAULT_SESSION_KEY)
+
+def _cookies():
+    # Only include the BLT_partner_session cookie, read fresh so a rotated key applies immediately
+    return {"BLT_partner_session": session_keys.get()}
+
+def _cache_params(params=None):
+    # Key cache entries by session so a rotated cookie is always checked live
+    session_key = session_keys.get()
+    return {"session": hashlib.sha256(session_key.encode("utf-8")).hexdigest()[:16], **(params or {})}
 
-def get_bucketlister_data():
+def _store_rotated_session(response):
+    # The server rotates the session through Set-Cookie; keep whatever it hands back
+    new_key = response.cookies.get("BLT_partner_session")
+    if new_key and new_key != session_keys.get():
+        session_keys.set(new_key)
+        logger.info(f"Bucketlister session rotated, now valid until {session_expiry(new_key)}")
+        return True
+    return False
+
+def refresh_session():
+    """
+    Exchange the session's refresh token for a new session
+    
+    Returns:
+        bool: True if a new session key was stored
+    """
+    if not decode_session(session_keys.get()).get("refreshToken"):
+        logger.warning("Bucketlister session has no refresh token, a new key must be provided")
+        return False
+    
+    try:
+        response = get_session().get(Config.get_bucketlister_config()['refresh_url'], cookies=_cookies())
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not refresh Bucketlister session: {str(e)}")
+        return False
+    
+    if not _store_rotated_session(response):
+        logger.warning(f"Bucketlister session refresh returned no new session (status {response.status_code})")
+        return False
+    return True
+
+def _ensure_fresh_session():
+    # Refresh ahead of the JWT exp claim rather than failing a run on an expired key
+    expiry = session_expiry(session_keys.get())
+    margin = Config.get_bucketlister_config()['refresh_margin']
+    if expiry and (expiry - datetime.now(timezone.utc)).total_seconds() < margin:
+        logger.info(f"Bucketlister session expires at {expiry}, refreshing")
+        refresh_session()
+
+# Serializes fetches so concurrent callers share one request through the cache
+_fetch_lock = threading.Lock()
+
+def get_bucketlister_data(start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Fetch the insights document, shared by the key check, the daily series and the totals
+
+    A fresh cached copy is returned without a request. Otherwise a stale copy
+    is revalidated with If-None-Match/If-Modified-Since, so a refresh costs at
+    most one round trip and an unchanged document is not downloaded again.
+    The session is refreshed before its JWT expires, and once more if the
+    server rejects it anyway.
+    
+    Args:
+        start: First day of the requested window, or None for the whole history
+        end: Last day of the requested window
+    """
+    params = {'startDate': start.isoformat(), 'endDate': end.isoformat()} if start else {}
+    cache = get_response_cache()
+    with _fetch_lock:
+        data = cache.get('bucketlister', url, _cache_params(params))
+        if data is not None:
+            return data
+        
+        _ensure_fresh_session()
+        response, data = _fetch(cache, params)
+        if not response.ok or 'error' in data:
+            if refresh_session():
+                response, data = _fetch(cache, params)
+        
+        # Never cache error documents, they are how an expired key shows up
+        if response.ok and 'error' not in data and response.status_code != 304:
+            _cache_document(cache, params, response, data)
+        return data
+
+def try_session_key(key: str, start: Optional[date] = None, end: Optional[date] = None) -> bool:
+    """
+    Check a candidate session key against Bucketlister and store it if accepted
+    
+    The candidate is sent as the cookie of one insights request; the stored
+    key is only replaced when that request succeeds, so a rejected key never
+    affects other processes. The fetched document is cached for the next
+    refresh.
+    
+    Args:
+        key: Candidate BLT_partner_session cookie value
+        start: First day of the requested window, or None for the whole history
+        end: Last day of the requested window
+    
+    Returns:
+        bool: True if the key was accepted and stored
+    """
+    params = {'startDate': start.isoformat(), 'endDate': end.isoformat()} if start else {}
+    with _fetch_lock:
+        try:
+            response = get_session().get(url, params=params, cookies={"BLT_partner_session": key})
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not check the new Bucketlister session key: {str(e)}")
+            return False
+        
+        data = _parse_document(response)
+        if not response.ok or 'error' in data:
+            logger.warning(f"Bucketlister rejected the new session key (status {response.status_code}), keeping the current one")
+            return False
+        
+        # Keep the rotated session if the server handed one back
+        session_keys.set(response.cookies.get("BLT_partner_session") or key)
+        _cache_document(get_response_cache(), params, response, data)
+        return True
+
+def _cache_document(cache, params, response, data):
+    validators = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+    cache.put('bucketlister', url, _cache_params(params), data, {k: v for k, v in validators.items() if v})
+
+def _parse_document(response):
+    try:
+        return response.json()
+    except ValueError:
+        # An expired session gets a login page instead of the JSON document
+        return {'error': f"Unexpected non-JSON response (status {response.status_code})"}
+
+def _fetch(cache, params):
+    stale, validators = cache.get_stale('bucketlister', url, _cache_params(params))
+    headers = {}
+    if stale is not None and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if stale is not None and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    
     # Send the GET request with the specified cookie
-    response = requests.get(url, cookies=cookies)       
-    return response.json()
+    response = get_session().get(url, params=params, cookies=_cookies(), headers=headers)
+    _store_rotated_session(response)
+    if response.status_code == 304 and stale is not None:
+        logger.info("Bucketlister data not modified, reusing cached copy")
+        cache.touch('bucketlister', url, _cache_params(params))
+        return response, stale
+    
+    return response, _parse_document(response)
+
+interval_store = BucketlisterIntervalStore()
 
 def actual_get_tickets_sold():
-    data = get_bucketlister_data()
-    return data['salesByExperience']['overallSummary']['ticketsSold']
+    # Summed from the synced intervals, so the total shares the windowed
+    # document with the key check and the daily series
+    return sum(BucketlisterIntervalStore.daily_tickets(sync_intervals()).values())
+
+def sync_window():
+    """Get the (start, end) window the next interval sync requests, (None, None) for everything"""
+    window_days = Config.get_bucketlister_config()['window_days']
+    return BucketlisterIntervalStore.sync_window(interval_store.load(), datetime.now(timezone.utc).date(), window_days)
+
+def sync_intervals():
+    """
+    Request the recent window of interval data and merge it into the local store
+    
+    Returns:
+        Dict: The updated interval store
+    """
+    store = interval_store.load()
+    start, end = sync_window()
+    today = end or datetime.now(timezone.utc).date()
+    data = get_bucketlister_data(start, end)
+    BucketlisterIntervalStore.merge(store, data, start, today)
+    interval_store.save(store)
+    logger.info(f"Synced Bucketlister intervals {'since ' + start.isoformat() if start else 'for the whole history'}")
+    return store
 
 def bucketlister_daily():
-    data = get_bucketlister_data()
-    daily_data = {}
-    for summary in data['salesByExperience']['intervalSummaries']:
-        date = summary['intervalStart'].split('T')[0]  # Get just the date part
-        if date not in daily_data:
-            daily_data[date] = 0
-        daily_data[date] += summary['ticketsSold']
-    return daily_data
+    return BucketlisterIntervalStore.daily_tickets(sync_intervals())
+
+class BucketlisterCollector(DataCollector):
+    """Collects daily tickets sold from Bucketlister"""
+    
+    def __init__(self):
+        # Tickets sold per day for each experience, filled by acollect()
+        self.daily_by_experience = {}
+    
+    async def acollect(self) -> Dict[str, int]:
+        """Collect Bucketlister tickets sold per day"""
+        try:
+            store = await run_blocking(sync_intervals)
+            daily_data = BucketlisterIntervalStore.daily_tickets(store)
+            self.daily_by_experience = BucketlisterIntervalStore.daily_by_experience(store)
+            
+            if self.validate_data(daily_data):
+                logger.info("Successfully collected Bucketlister data")
+                return daily_data
+            else:
+                raise ValueError("Collected data failed validation")
+                
+        except Exception as e:
+            logger.error(f"Error collecting Bucketlister data: {str(e)}")
+            raise
+    
+    def validate_data(self, data: Dict[str, Any]) -> bool:
+        """Validate collected data"""
+        if any(tickets < 0 for tickets in data.values()):
+            logger.error("Negative tickets sold in daily data")
+            return False
+        
+        return True
 
 # gets a getter function for the tickets sold
 class get_tickets_sold:
@@ -38,7 +244,10 @@ class get_tickets_sold:
 
 def update_session_key(new_key):
     """
-    Update the BLT_partner_session cookie value in this file.
+    Replace the BLT_partner_session cookie value.
+    
+    The key is written atomically to the session key store, which every
+    collector reads on each call, so no restart is needed.
     
     Args:
         new_key (str): The new session key value
@@ -47,32 +256,10 @@ def update_session_key(new_key):
         bool: True if successful, False otherwise
     """
     try:
-        # Get the path to this file
-        file_path = os.path.abspath(__file__)
-        
-        # Read the current file content
-        with open(file_path, 'r') as file:
-            content = file.read()
-        
-        # Define the pattern to match the cookie definition
-        pattern = r'cookies = \{\s*"BLT_partner_session": "(.*?)"\s*\}'
-        
-        # Replace the key with the new one
-        updated_content = re.sub(pattern, f'cookies = {{\n    "BLT_partner_session": "{new_key}"\n}}', content)
-        
-        # Write the updated content back to the file
-        with open(file_path, 'w') as file:
-            file.write(updated_content)
-        
-        # Update the cookies dictionary in memory
-        global cookies
-        cookies = {
-            "BLT_partner_session": new_key
-        }
-        
+        session_keys.set(new_key)
         return True
     except Exception as e:
-        print(f"Error updating session key: {str(e)}")
+        logger.error(f"Error updating session key: {str(e)}")
         return False
 
 if __name__ == "__main__":
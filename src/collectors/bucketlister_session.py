@@ -0,0 +1,101 @@
+"""
+Hot-swappable store for the Bucketlister session key
+"""
+
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.utils.logger import setup_logger
+from src.utils.state import get_state_dir, load_json, save_json
+
+logger = setup_logger('bucketlister_session')
+
+def _b64_json(segment: str) -> Dict[str, Any]:
+    decoded = base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+    value = json.loads(decoded)
+    return value if isinstance(value, dict) else {}
+
+def decode_session(key: Optional[str]) -> Dict[str, Any]:
+    """
+    Decode the payload of a signed BLT_partner_session cookie
+
+    Args:
+        key: Cookie value (base64 JSON payload, a dot and the signature)
+
+    Returns:
+        Dict with 'token' (JWT) and 'refreshToken', or empty if undecodable
+    """
+    try:
+        return _b64_json(key.split('.')[0])
+    except (AttributeError, ValueError):
+        return {}
+
+def session_expiry(key: Optional[str]) -> Optional[datetime]:
+    """
+    Get when the session's JWT expires
+
+    Args:
+        key: Cookie value
+
+    Returns:
+        The JWT exp claim as an aware datetime, or None if it cannot be read
+    """
+    try:
+        claims = _b64_json(decode_session(key)['token'].split('.')[1])
+        return datetime.fromtimestamp(int(claims['exp']), tz=timezone.utc)
+    except (KeyError, IndexError, AttributeError, TypeError, ValueError):
+        return None
+
+class SessionKeyStore:
+    """
+    Holds the BLT_partner_session key in a state file replaced atomically
+
+    Writers replace the whole file with write-then-rename, so readers in any
+    process see either the old or the new key. Readers only re-read the file
+    when it has been replaced, so checking on every request is cheap and a
+    rotated key takes effect on the next call.
+    """
+
+    def __init__(self, path: Optional[Path] = None, default: Optional[str] = None):
+        self.path = Path(path) if path else get_state_dir('bucketlister') / 'session.json'
+        self.default = default
+        self._key = None
+        self._file_version = None
+        self._lock = threading.Lock()
+
+    def _version(self) -> tuple:
+        # Every rename creates a new inode, so this changes even within one mtime tick
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns
+
+    def get(self) -> Optional[str]:
+        """Get the current session key (the default if none was ever stored)"""
+        try:
+            version = self._version()
+        except FileNotFoundError:
+            return self.default
+
+        with self._lock:
+            if version != self._file_version:
+                record = load_json(self.path) or {}
+                self._key = record.get('key')
+                self._file_version = version
+            return self._key or self.default
+
+    def set(self, key: str) -> None:
+        """
+        Replace the session key
+
+        Args:
+            key: New BLT_partner_session cookie value
+        """
+        with self._lock:
+            save_json(self.path, {'key': key, 'updated_at': datetime.now(timezone.utc).isoformat()})
+            self._key = key
+            self._file_version = self._version()
+        logger.info("Stored new Bucketlister session key")
@@ -0,0 +1,107 @@
+"""
+Local store of Bucketlister tickets sold per day and experience
+"""
+
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from src.utils.state import get_state_dir, load_json, save_json
+
+class BucketlisterIntervalStore:
+    """Persists daily ticket sales so each refresh only needs a recent window"""
+
+    def __init__(self, directory: Optional[Path] = None):
+        directory = Path(directory) if directory else get_state_dir('bucketlister')
+        self.path = directory / "intervals.json"
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Load the store
+
+        Returns:
+            Dict with 'synced_through' (last synced day, or None) and 'days'
+            (date -> {'total': tickets, 'experiences': name -> tickets})
+        """
+        return load_json(self.path) or {'synced_through': None, 'days': {}}
+
+    def save(self, store: Dict[str, Any]) -> None:
+        """Persist the store"""
+        save_json(self.path, store)
+
+    @staticmethod
+    def sync_window(store: Dict[str, Any], today: date, window_days: int) -> Tuple[Optional[date], Optional[date]]:
+        """
+        Get the date range the next refresh has to request
+
+        Args:
+            store: Store from load()
+            today: Last day to request
+            window_days: Days before today whose sales may still change (0
+                always requests the whole history)
+
+        Returns:
+            Tuple of (start, end), or (None, None) for the whole history
+        """
+        if not store['synced_through'] or window_days <= 0:
+            return None, None
+        return min(today - timedelta(days=window_days), date.fromisoformat(store['synced_through'])), today
+
+    @staticmethod
+    def merge(store: Dict[str, Any], data: Dict[str, Any], start: Optional[date], today: date) -> None:
+        """
+        Replace the requested days with the intervals of a fetched document
+
+        Intervals outside start..today are ignored, so a document covering
+        more than the requested days does not count those days twice.
+
+        Args:
+            store: Store from load()
+            data: Bucketlister insights document for start..today
+            start: First requested day, or None if the whole history was requested
+            today: Last requested day
+        """
+        days = store['days']
+        if start is None:
+            days.clear()
+        else:
+            for day in [day for day in days if day >= start.isoformat()]:
+                del days[day]
+
+        def in_window(day: str) -> bool:
+            # The server may ignore the date range and send the whole history;
+            # days outside the window are already stored and must not be added twice
+            return start is None or start.isoformat() <= day <= today.isoformat()
+
+        sales = data['salesByExperience']
+        for summary in sales['intervalSummaries']:
+            day = summary['intervalStart'].split('T')[0]  # Get just the date part
+            if not in_window(day):
+                continue
+            entry = days.setdefault(day, {'total': 0, 'experiences': {}})
+            entry['total'] += summary['ticketsSold']
+
+        for experience in sales.get('experiences', []):
+            name = experience.get('name') or str(experience.get('id', 'Unknown'))
+            for summary in experience.get('intervalSummaries', []):
+                day = summary['intervalStart'].split('T')[0]
+                if not in_window(day):
+                    continue
+                entry = days.setdefault(day, {'total': 0, 'experiences': {}})
+                entry['experiences'][name] = entry['experiences'].get(name, 0) + summary['ticketsSold']
+
+        store['synced_through'] = today.isoformat()
+
+    @staticmethod
+    def daily_tickets(store: Dict[str, Any]) -> Dict[str, int]:
+        """Get the tickets sold per day, oldest first"""
+        return {day: entry['total'] for day, entry in sorted(store['days'].items())}
+
+    @staticmethod
+    def daily_by_experience(store: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Get the tickets sold per day for each experience"""
+        series = {}
+        for day, entry in sorted(store['days'].items()):
+            for name, tickets in entry['experiences'].items():
+                series.setdefault(name, {})[day] = tickets
+        return series
@@ -0,0 +1,95 @@
+"""
+Single-pass aggregation of Divvy spend
+"""
+
+from datetime import date
+from typing import Dict, Any, Iterable
+
+from src.collectors.divvy_index import SpendIndex
+from src.utils.logger import setup_logger
+
+logger = setup_logger('divvy_aggregator')
+
+class SpendAggregator:
+    """
+    Rolls up Divvy transactions as they stream in from the API
+
+    Totals, counts, the daily, category and merchant rollups and the
+    merchant x category x day index are all updated in one pass per
+    transaction. The day is taken from the first ten characters of
+    occurredTime (the date in the timestamp's own offset) and each distinct
+    day is validated only the first time it is seen.
+    """
+
+    def __init__(self):
+        self.total_spend = 0
+        self.transaction_count = 0
+        self.daily_spend: Dict[str, float] = {}
+        self.categories: Dict[str, Dict[str, Any]] = {}
+        self.merchants: Dict[str, float] = {}
+        self.index = SpendIndex()
+
+    def add(self, transaction: Dict[str, Any]) -> None:
+        """
+        Fold one transaction into the rollups (declined transactions are skipped)
+
+        Args:
+            transaction: Transaction as returned by the Divvy API
+        """
+        if transaction.get('transactionType') == 'DECLINE':
+            return
+
+        try:
+            amount = float(transaction.get('amount', 0))
+            day = transaction.get('occurredTime', '')[:10]
+            if day not in self.daily_spend:
+                date.fromisoformat(day)
+                self.daily_spend[day] = 0
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Error processing transaction {transaction.get('id')}: {str(e)}")
+            return
+
+        merchant = transaction.get('merchantName', 'Unknown')
+        category = transaction.get('merchantCategoryCode', 'Uncategorized')
+
+        self.total_spend += amount
+        self.transaction_count += 1
+        self.daily_spend[day] += amount
+        self.merchants[merchant] = self.merchants.get(merchant, 0) + amount
+        self.index.add(merchant, category, day, amount)
+
+        entry = self.categories.get(category)
+        if entry is None:
+            entry = self.categories[category] = {'total': 0, 'merchants': set()}
+        entry['total'] += amount
+        entry['merchants'].add(merchant)
+
+    def add_all(self, transactions: Iterable[Dict[str, Any]]) -> None:
+        """Fold an iterable of transactions into the rollups"""
+        for transaction in transactions:
+            self.add(transaction)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the rollups
+
+        Returns:
+            Dict with 'total_spend', 'transaction_count', 'spend_by_category'
+            (category -> total and merchants), 'spend_by_merchant' (merchant ->
+            total), 'daily_spend' (date and spend per day, oldest first) and
+            'spend_index' (SpendIndex rows)
+        """
+        return {
+            'total_spend': self.total_spend,
+            'transaction_count': self.transaction_count,
+            'spend_by_category': {
+                category: {'total': entry['total'], 'merchants': sorted(entry['merchants'])}
+                for category, entry in self.categories.items()
+            },
+            'spend_by_merchant': self.merchants,
+            'daily_spend': [
+                {'date': day, 'spend': amount}
+                for day, amount in sorted(self.daily_spend.items())
+            ],
+            'spend_index': self.index.rows()
+        }
@@ -1,10 +1,15 @@
 import os
 import requests
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 import json
 
 from src.collectors import DataCollector
+from src.collectors.divvy_aggregator import SpendAggregator
+from src.collectors.divvy_ledger import DivvyLedger, format_time, normalize_time
+from src.config import Config
+from src.utils.cache import get_response_cache
+from src.utils.http import get_session, run_blocking
 from src.utils.logger import setup_logger
 
 logger = setup_logger('divvy_collector')
@@ -12,88 +17,188 @@ logger = setup_logger('divvy_collector')
 class DivvyCollector(DataCollector):
     """Collector for Divvy credit card expenses."""
     
+    # The raw transactions are only needed for debugging
+    output_fields = {
+        'timestamp': True,
+        'total_spend': True,
+        'transaction_count': True,
+        'spend_by_category': True,
+        'spend_by_merchant': True,
+        'start_date': True,
+        'end_date': True,
+        'daily_spend': True,
+        'spend_index': True
+    }
+    
     def __init__(self):
         self.api_token = os.getenv('DIVVY_API_TOKEN')
         if not self.api_token:
             raise ValueError("DIVVY_API_TOKEN environment variable is not set")
         
-        self.base_url = "https://gateway.prod.bill.com/connect/v3"
+        config = Config.get_divvy_config()
+        self.base_url = config['base_url']
         self.headers = {
             "apiToken": self.api_token,
             "Accept": "application/json"
         }
         
         # Default to last 90 days of data
-        self.default_days = 90
+        self.default_days = config['default_days']
+        self.page_size = config['page_size']
+        
+        self.cache = get_response_cache()
+        
+        # Local ledger of transactions; only the settle window is re-fetched
+        self.settle_days = config['settle_days']
+        self.ledger = DivvyLedger() if config['ledger'] else None
 
-    def get_transactions(self, start_date: datetime = None, end_date: datetime = None) -> List[Dict[Any, Any]]:
+    def iter_transactions(self, start_date: datetime = None, end_date: datetime = None) -> Iterator[Dict[Any, Any]]:
         """
-        Fetch transactions from Divvy API.
+        Fetch transactions from Divvy API page by page.
+        
+        The date range is sent to the API as an occurredTime filter, widened to
+        whole days so cached pages stay valid for the rest of the day, and the
+        exact bounds are applied to each page as it arrives. The bounds are
+        compared as fixed-width UTC strings, so UTC timestamps are never parsed.
         
         Args:
             start_date: Optional start date for filtering transactions (timezone-aware)
             end_date: Optional end date for filtering transactions (timezone-aware)
             
-        Returns:
-            List of transaction dictionaries
+        Yields:
+            Transaction dictionaries
         """
         url = f"{self.base_url}/spend/transactions"
         
+        # Normalize the bounds once rather than per transaction
+        if start_date and start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=timezone.utc)
+        if end_date and end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        
+        params = {'max': self.page_size}
+        filters = []
+        if start_date:
+            day_start = start_date.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            filters.append(f'occurredTime:gte:"{day_start.strftime("%Y-%m-%dT%H:%M:%S.000Z")}"')
+        if end_date:
+            day_end = end_date.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            filters.append(f'occurredTime:lt:"{day_end.strftime("%Y-%m-%dT%H:%M:%S.000Z")}"')
+        if filters:
+            params['filters'] = ','.join(filters)
+        
+        # Normalized once; each transaction is compared as a string
+        start_key = format_time(start_date) if start_date else None
+        end_key = format_time(end_date) if end_date else None
+        
         try:
-            response = requests.get(url, headers=self.headers)
-            logger.debug(f"API Response Status Code: {response.status_code}")
-            
-            response.raise_for_status()
-            
-            try:
-                data = response.json()
-                transactions = data.get('results', [])
-                logger.debug(f"Found {len(transactions)} transactions")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {str(e)}")
-                logger.error(f"Response content: {response.text}")
-                raise
-            
-            # Filter transactions by date if dates are provided
-            if start_date or end_date:
-                filtered_transactions = []
-                for transaction in transactions:
+            page_count = 0
+            while True:
+                data = self.cache.get('divvy', 'spend/transactions', params)
+                if data is None:
+                    response = get_session().get(url, headers=self.headers, params=params)
+                    logger.debug(f"API Response Status Code: {response.status_code}")
+                    
+                    response.raise_for_status()
+                    
                     try:
+                        data = response.json()
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Failed to parse JSON response: {str(e)}")
+                        logger.error(f"Response content: {response.text}")
+                        raise
+                    
+                    self.cache.put('divvy', 'spend/transactions', params, data)
+                
+                page_count += 1
+                for transaction in data.get('results', []):
+                    if start_date or end_date:
                         occurred_time = transaction.get('occurredTime', '')
                         if not occurred_time:
                             logger.warning(f"Transaction missing occurredTime: {transaction.get('id')}")
                             continue
-                            
-                        # Parse the ISO format datetime and ensure it's timezone-aware
-                        transaction_date = datetime.fromisoformat(occurred_time.replace('Z', '+00:00'))
-                        if transaction_date.tzinfo is None:
-                            transaction_date = transaction_date.replace(tzinfo=timezone.utc)
-                        
-                        # Ensure comparison dates are timezone-aware
-                        if start_date and start_date.tzinfo is None:
-                            start_date = start_date.replace(tzinfo=timezone.utc)
-                        if end_date and end_date.tzinfo is None:
-                            end_date = end_date.replace(tzinfo=timezone.utc)
-                        
-                        if start_date and transaction_date < start_date:
+                        try:
+                            occurred_key = normalize_time(occurred_time)
+                        except ValueError:
+                            logger.warning(f"Could not parse transaction date: {occurred_time}")
                             continue
-                        if end_date and transaction_date > end_date:
+                        if (start_key and occurred_key < start_key) or (end_key and occurred_key > end_key):
                             continue
-                            
-                        filtered_transactions.append(transaction)
-                    except (ValueError, AttributeError) as e:
-                        logger.warning(f"Could not parse transaction date: {occurred_time}")
-                        continue
+                    yield transaction
                 
-                logger.debug(f"Filtered to {len(filtered_transactions)} transactions within date range")
-                return filtered_transactions
-                
-            return transactions
+                next_page = data.get('nextPage')
+                if not next_page:
+                    break
+                params = {**params, 'nextPage': next_page}
+            
+            logger.debug(f"Fetched {page_count} pages of transactions")
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching Divvy transactions: {str(e)}")
             raise
 
+    def get_transactions(self, start_date: datetime = None, end_date: datetime = None) -> List[Dict[Any, Any]]:
+        """
+        Fetch all transactions in a date range from Divvy API.
+        
+        Args:
+            start_date: Optional start date for filtering transactions (timezone-aware)
+            end_date: Optional end date for filtering transactions (timezone-aware)
+            
+        Returns:
+            List of transaction dictionaries
+        """
+        transactions = list(self.iter_transactions(start_date, end_date))
+        logger.debug(f"Found {len(transactions)} transactions within date range")
+        return transactions
+
+    def _sync_ledger(self, start_date: datetime, end_date: datetime, include_raw: bool) -> Tuple[List[Dict[Any, Any]], Dict[str, Any]]:
+        """
+        Bring the ledger up to date and read the window back from it.
+        
+        Only transactions since the ledger watermark, minus the settle window,
+        are fetched, and they replace everything stored for that span. Older
+        transactions are considered final.
+        
+        Args:
+            start_date: Window start (timezone-aware)
+            end_date: Window end (timezone-aware)
+            include_raw: Whether to read the window's raw transactions back
+            
+        Returns:
+            Tuple of the window's transactions (empty unless include_raw) and their summary
+        """
+        watermark = self.ledger.watermark()
+        since = watermark - timedelta(days=self.settle_days) if watermark else start_date
+        
+        written = self.ledger.upsert(self.iter_transactions(since, end_date), (since, end_date))
+        logger.info(f"Synced {written} Divvy transactions since {since.date()} into the ledger")
+        
+        transactions = self.ledger.transactions(start_date, end_date) if include_raw else []
+        return transactions, self.ledger.summary(start_date, end_date)
+
+    def _stream_transactions(self, start_date: datetime, end_date: datetime, include_raw: bool) -> Tuple[List[Dict[Any, Any]], Dict[str, Any]]:
+        """
+        Fetch the window's transactions and aggregate them as each page arrives.
+        
+        Args:
+            start_date: Window start (timezone-aware)
+            end_date: Window end (timezone-aware)
+            include_raw: Whether to keep the raw transactions
+            
+        Returns:
+            Tuple of the window's transactions (empty unless include_raw) and their summary
+        """
+        aggregator = SpendAggregator()
+        transactions = []
+        for transaction in self.iter_transactions(start_date, end_date):
+            if include_raw:
+                transactions.append(transaction)
+            aggregator.add(transaction)
+        
+        logger.debug(f"Aggregated {aggregator.transaction_count} transactions within date range")
+        return transactions, aggregator.summary()
+
     def _create_empty_data(self) -> Dict[str, Any]:
         """Create empty data structure when no transactions are found"""
         current_time = datetime.now(timezone.utc)
@@ -103,9 +208,11 @@ class DivvyCollector(DataCollector):
             'transaction_count': 0,
             'transactions': [],
             'spend_by_category': {},
+            'spend_by_merchant': {},
             'start_date': (current_time - timedelta(days=self.default_days)).isoformat(),
             'end_date': current_time.isoformat(),
-            'daily_spend': []
+            'daily_spend': [],
+            'spend_index': []
         }
 
     def validate_data(self, data: Dict[str, Any]) -> bool:
@@ -134,7 +241,7 @@ class DivvyCollector(DataCollector):
             logger.error(f"Error validating data: {str(e)}")
             return False
 
-    def collect(self) -> Dict[str, Any]:
+    async def acollect(self) -> Dict[str, Any]:
         """
         Collect all relevant Divvy data.
         
@@ -146,75 +253,32 @@ class DivvyCollector(DataCollector):
         start_date = end_date - timedelta(days=self.default_days)
         
         try:
-            transactions = self.get_transactions(start_date, end_date)
+            # Raw transactions are only kept when they survive projection
+            if self.ledger:
+                transactions, summary = await run_blocking(self._sync_ledger, start_date, end_date, self.include_raw)
+            else:
+                transactions, summary = await run_blocking(self._stream_transactions, start_date, end_date, self.include_raw)
             
-            if not transactions:
+            if not summary['transaction_count']:
                 logger.warning("No transactions found")
-                return self._create_empty_data()
-            
-            # Calculate total spend and categorize
-            total_spend = 0
-            categories = {}
-            daily_spend = {}
-            
-            for transaction in transactions:
-                try:
-                    # Skip declined transactions
-                    if transaction.get('transactionType') == 'DECLINE':
-                        continue
-                        
-                    amount = float(transaction.get('amount', 0))
-                    merchant = transaction.get('merchantName', 'Unknown')
-                    category = transaction.get('merchantCategoryCode', 'Uncategorized')
-                    occurred_time = transaction.get('occurredTime', '')
-                    
-                    # Parse transaction date for daily breakdown
-                    transaction_date = datetime.fromisoformat(occurred_time.replace('Z', '+00:00')).date()
-                    date_str = str(transaction_date)
-                    
-                    # Update daily spend
-                    if date_str not in daily_spend:
-                        daily_spend[date_str] = 0
-                    daily_spend[date_str] += amount
-                    
-                    # Update total spend and categories
-                    total_spend += amount
-                    if category not in categories:
-                        categories[category] = {
-                            'total': 0,
-                            'merchants': set()
-                        }
-                    categories[category]['total'] += amount
-                    categories[category]['merchants'].add(merchant)
-                    
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"Error processing transaction amount: {str(e)}")
-                    continue
-            
-            # Convert merchant sets to lists for JSON serialization
-            for category in categories.values():
-                category['merchants'] = list(category['merchants'])
-            
-            # Prepare daily spend data
-            daily_spend_list = [
-                {'date': date, 'spend': amount}
-                for date, amount in sorted(daily_spend.items())
-            ]
+                return self.project(self._create_empty_data())
             
             data = {
                 'timestamp': datetime.now(timezone.utc).isoformat(),
-                'total_spend': total_spend,
-                'transaction_count': len([t for t in transactions if t.get('transactionType') != 'DECLINE']),
+                'total_spend': summary['total_spend'],
+                'transaction_count': summary['transaction_count'],
                 'transactions': transactions,
-                'spend_by_category': categories,
+                'spend_by_category': summary['spend_by_category'],
+                'spend_by_merchant': summary['spend_by_merchant'],
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
-                'daily_spend': daily_spend_list
+                'daily_spend': summary['daily_spend'],
+                'spend_index': summary['spend_index']
             }
             
             if self.validate_data(data):
                 logger.info("Successfully collected Divvy data")
-                return data
+                return self.project(data)
             else:
                 raise ValueError("Collected data failed validation")
             
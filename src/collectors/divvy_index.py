@@ -0,0 +1,125 @@
+"""
+Merchant x category x day index of Divvy spend
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+class SpendIndex:
+    """
+    Spend per (merchant, category) for each day, with top-N and range queries
+
+    Cells are bucketed by day and the days are kept sorted, so a date range
+    only visits the days inside it. Top-N queries use a heap over the
+    per-merchant or per-category totals of the range.
+    """
+
+    def __init__(self):
+        self._days: List[str] = []
+        self._cells: Dict[str, Dict[Tuple[str, str], float]] = {}
+
+    def add(self, merchant: str, category: str, day: str, amount: float) -> None:
+        """
+        Add spend to a cell
+
+        Args:
+            merchant: Merchant name
+            category: Merchant category code
+            day: ISO date (YYYY-MM-DD)
+            amount: Spend in dollars
+        """
+        cells = self._cells.get(day)
+        if cells is None:
+            cells = self._cells[day] = {}
+            position = bisect_left(self._days, day)
+            self._days.insert(position, day)
+        key = (merchant, category)
+        cells[key] = cells.get(key, 0) + amount
+
+    def _range(self, start: Optional[str], end: Optional[str]) -> Iterable[Tuple[str, Dict[Tuple[str, str], float]]]:
+        low = bisect_left(self._days, start) if start else 0
+        high = bisect_right(self._days, end) if end else len(self._days)
+        for day in self._days[low:high]:
+            yield day, self._cells[day]
+
+    def _totals(self, position: int, start: Optional[str], end: Optional[str], category: Optional[str] = None) -> Dict[str, float]:
+        totals = {}
+        for _, cells in self._range(start, end):
+            for key, amount in cells.items():
+                if category is not None and key[1] != category:
+                    continue
+                totals[key[position]] = totals.get(key[position], 0) + amount
+        return totals
+
+    def top_merchants(self, n: int = 10, start: Optional[str] = None, end: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the merchants with the most spend
+
+        Args:
+            n: Number of merchants to return
+            start: First day of the range (inclusive), or None for all days
+            end: Last day of the range (inclusive), or None for all days
+            category: Only count spend in this merchant category code
+
+        Returns:
+            List of {'merchant', 'spend'} dicts, highest spend first
+        """
+        totals = self._totals(0, start, end, category)
+        return [
+            {'merchant': merchant, 'spend': round(spend, 2)}
+            for merchant, spend in heapq.nlargest(n, totals.items(), key=lambda item: item[1])
+        ]
+
+    def top_categories(self, n: int = 10, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the merchant categories with the most spend
+
+        Args:
+            n: Number of categories to return
+            start: First day of the range (inclusive), or None for all days
+            end: Last day of the range (inclusive), or None for all days
+
+        Returns:
+            List of {'category', 'spend'} dicts, highest spend first
+        """
+        totals = self._totals(1, start, end)
+        return [
+            {'category': category, 'spend': round(spend, 2)}
+            for category, spend in heapq.nlargest(n, totals.items(), key=lambda item: item[1])
+        ]
+
+    def merchant_daily(self, merchant: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get one merchant's spend per day
+
+        Args:
+            merchant: Merchant name
+            start: First day of the range (inclusive), or None for all days
+            end: Last day of the range (inclusive), or None for all days
+
+        Returns:
+            List of {'date', 'spend'} dicts for days with spend, oldest first
+        """
+        daily = []
+        for day, cells in self._range(start, end):
+            spend = sum(amount for (cell_merchant, _), amount in cells.items() if cell_merchant == merchant)
+            if spend:
+                daily.append({'date': day, 'spend': round(spend, 2)})
+        return daily
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Serialize the index as {'merchant', 'category', 'date', 'spend'} rows, oldest first"""
+        return [
+            {'merchant': merchant, 'category': category, 'date': day, 'spend': amount}
+            for day, cells in self._range(None, None)
+            for (merchant, category), amount in sorted(cells.items())
+        ]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> 'SpendIndex':
+        """Rebuild an index from rows()"""
+        index = cls()
+        for row in rows:
+            index.add(row['merchant'], row['category'], row['date'], row['spend'])
+        return index
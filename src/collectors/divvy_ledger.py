@@ -0,0 +1,213 @@
+"""
+Local SQLite ledger of Divvy transactions
+"""
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from src.utils.state import get_state_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    uuid TEXT PRIMARY KEY,
+    occurred_time TEXT NOT NULL,
+    occurred_date TEXT NOT NULL,
+    transaction_type TEXT,
+    amount REAL NOT NULL,
+    merchant_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_occurred_time ON transactions (occurred_time);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def format_time(value: datetime) -> str:
+    """Format a datetime as a fixed-width UTC string that sorts chronologically"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def normalize_time(value: str) -> str:
+    """
+    Convert an occurredTime to the fixed-width UTC form of format_time
+
+    Timestamps already in UTC (a Z or +00:00 suffix, as the API returns
+    them) are rewritten as strings; only other offsets are parsed.
+
+    Args:
+        value: ISO timestamp from the Divvy API
+
+    Returns:
+        str: Timestamp that sorts chronologically against format_time values
+
+    Raises:
+        ValueError: If the timestamp cannot be parsed
+    """
+    for suffix in ('Z', '+00:00'):
+        if value.endswith(suffix):
+            stamp, _, fraction = value[:-len(suffix)].partition('.')
+            if len(stamp) == 19 and stamp[10] == 'T' and (fraction.isdigit() or not fraction):
+                return f"{stamp}.{(fraction + '000000')[:6]}Z"
+    return format_time(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+class DivvyLedger:
+    """
+    Persists Divvy transactions keyed by uuid
+
+    Re-fetched transactions replace their stored row, so later states of the
+    same transaction (declined, reconciled) overwrite earlier ones. A clear
+    gets a uuid of its own and replaces the authorization it points to
+    through originalAuthTransactionUuid. Aggregates for any date window are
+    answered from the ledger.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else get_state_dir('divvy') / 'ledger.sqlite3'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def watermark(self) -> Optional[datetime]:
+        """Latest occurredTime synced into the ledger, or None if it is empty"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = 'watermark'").fetchone()
+        if not row or not row[0]:
+            return None
+        return datetime.strptime(row[0], '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
+
+    def upsert(self, transactions: Iterable[Dict[str, Any]], window: Optional[Tuple[datetime, datetime]] = None) -> int:
+        """
+        Insert or replace transactions and advance the watermark
+
+        Authorizations replaced by a clear are removed. When the transactions
+        are the complete API listing for a window, stored transactions in
+        that window the listing no longer contains (voided or cleared
+        authorizations) are removed as well.
+
+        Args:
+            transactions: Transactions as returned by the Divvy API
+            window: Optional (start, end) the transactions completely cover
+
+        Returns:
+            int: Number of transactions written
+        """
+        rows = []
+        cleared = []
+        watermark = None
+        for transaction in transactions:
+            key = transaction.get('uuid') or transaction.get('id')
+            occurred_time = transaction.get('occurredTime')
+            if not key or not occurred_time:
+                continue
+            occurred = normalize_time(occurred_time)
+            rows.append((
+                str(key),
+                occurred,
+                occurred_time[:10],  # The date in the timestamp's own offset, as SpendAggregator uses
+                transaction.get('transactionType'),
+                float(transaction.get('amount', 0)),
+                transaction.get('merchantName', 'Unknown'),
+                transaction.get('merchantCategoryCode', 'Uncategorized'),
+                json.dumps(transaction)
+            ))
+            if transaction.get('originalAuthTransactionUuid'):
+                cleared.append((transaction['originalAuthTransactionUuid'],))
+            if watermark is None or occurred > watermark:
+                watermark = occurred
+
+        with closing(self._connect()) as conn, conn:
+            if window is not None:
+                # Only rows written below survive in the refetched window
+                conn.execute(
+                    "DELETE FROM transactions WHERE occurred_time BETWEEN ? AND ?",
+                    (format_time(window[0]), format_time(window[1]))
+                )
+            conn.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("DELETE FROM transactions WHERE uuid = ?", cleared)
+            if watermark is not None:
+                current = conn.execute("SELECT value FROM sync_state WHERE key = 'watermark'").fetchone()
+                if not current or watermark > current[0]:
+                    conn.execute("INSERT OR REPLACE INTO sync_state VALUES ('watermark', ?)", (watermark,))
+        return len(rows)
+
+    def _query(self, sql: str, start: datetime, end: datetime) -> List[tuple]:
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, (format_time(start), format_time(end))).fetchall()
+
+    def transactions(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Get the stored transactions that occurred in [start, end], newest first"""
+        rows = self._query(
+            "SELECT raw FROM transactions WHERE occurred_time BETWEEN ? AND ? ORDER BY occurred_time DESC",
+            start, end
+        )
+        return [json.loads(raw) for raw, in rows]
+
+    def summary(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        """
+        Aggregate the non-declined spend that occurred in [start, end]
+
+        Args:
+            start: Window start (timezone-aware)
+            end: Window end (timezone-aware)
+
+        Returns:
+            Dict with 'total_spend', 'transaction_count', 'spend_by_category'
+            (category -> total and merchants), 'spend_by_merchant' (merchant ->
+            total), 'daily_spend' (date and spend per day, oldest first) and
+            'spend_index' (SpendIndex rows)
+        """
+        window = "occurred_time BETWEEN ? AND ? AND COALESCE(transaction_type, '') != 'DECLINE'"
+
+        total_spend, transaction_count = self._query(
+            f"SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM transactions WHERE {window}", start, end
+        )[0]
+
+        spend_by_category = {}
+        spend_by_merchant = {}
+        for category, merchant, amount in self._query(
+            f"SELECT category, merchant_name, SUM(amount) FROM transactions WHERE {window} "
+            "GROUP BY category, merchant_name ORDER BY category, merchant_name",
+            start, end
+        ):
+            entry = spend_by_category.setdefault(category, {'total': 0, 'merchants': []})
+            entry['total'] += amount
+            entry['merchants'].append(merchant)
+            spend_by_merchant[merchant] = spend_by_merchant.get(merchant, 0) + amount
+
+        daily_spend = [
+            {'date': day, 'spend': amount}
+            for day, amount in self._query(
+                f"SELECT occurred_date, SUM(amount) FROM transactions WHERE {window} "
+                "GROUP BY occurred_date ORDER BY occurred_date",
+                start, end
+            )
+        ]
+
+        spend_index = [
+            {'merchant': merchant, 'category': category, 'date': day, 'spend': amount}
+            for day, merchant, category, amount in self._query(
+                f"SELECT occurred_date, merchant_name, category, SUM(amount) FROM transactions WHERE {window} "
+                "GROUP BY occurred_date, merchant_name, category ORDER BY occurred_date, merchant_name, category",
+                start, end
+            )
+        ]
+
+        return {
+            'total_spend': total_spend,
+            'transaction_count': transaction_count,
+            'spend_by_category': spend_by_category,
+            'spend_by_merchant': spend_by_merchant,
+            'daily_spend': daily_spend,
+            'spend_index': spend_index
+        }
@@ -0,0 +1,110 @@
+"""
+Graph API request batching for the Facebook Ads collector
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import requests
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger('facebook_batch')
+
+# Graph API limit on the number of requests in one batch
+MAX_BATCH_SIZE = 50
+
+def is_batch_size_error(error: Exception) -> bool:
+    """
+    Check whether a failed batch may succeed when sent in smaller pieces
+
+    Args:
+        error: Exception raised while sending the batch
+
+    Returns:
+        bool: True for timeouts, connection errors and 5xx responses
+    """
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code >= 500
+
+class GraphBatcher:
+    """
+    Coalesces concurrent Graph API GETs into batch requests
+
+    Requests submitted within a short window of each other (for example the
+    ads and insights edges, and their follow-up pages) are sent in a single
+    HTTP round trip. Each caller gets its own item of the batch response back.
+    The batch size follows the number of requests in flight, up to the Graph
+    API limit. It is halved whenever a whole batch times out or fails with a
+    server error, and the failed batch is split and sent again. Any other
+    failure (for example an invalid token) is passed to every caller as is.
+    """
+
+    def __init__(self, send_batch: Callable[[List[str]], List[Optional[Dict[str, Any]]]], window: float = 0.05, max_batch_size: int = MAX_BATCH_SIZE):
+        self.send_batch = send_batch
+        self.window = window
+        self.max_batch_size = max(1, min(max_batch_size, MAX_BATCH_SIZE))
+        self._pending: List[Tuple[str, Future]] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def submit(self, relative_url: str) -> Future:
+        """
+        Queue a GET for the next batch
+
+        Args:
+            relative_url: Request path and query relative to the API version
+
+        Returns:
+            Future resolving to the batch response item (code, headers, body)
+        """
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((relative_url, future))
+            if len(self._pending) >= self.max_batch_size:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            self._send(batch)
+        return future
+
+    def _take_pending(self) -> List[Tuple[str, Future]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: List[Tuple[str, Future]]) -> None:
+        try:
+            logger.info(f"Sending Graph API batch of {len(batch)} requests")
+            items = self.send_batch([relative_url for relative_url, _ in batch])
+        except Exception as e:
+            if len(batch) == 1 or not is_batch_size_error(e):
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            # Recursive sends may shrink max_batch_size again, so split on a fixed size
+            half = max(1, len(batch) // 2)
+            self.max_batch_size = min(self.max_batch_size, half)
+            logger.warning(f"Graph API batch of {len(batch)} failed ({str(e)}), retrying in batches of {half}")
+            for start in range(0, len(batch), half):
+                self._send(batch[start:start + half])
+            return
+
+        for (_, future), item in zip(batch, items):
+            future.set_result(item)
@@ -2,34 +2,125 @@
 Facebook Ads data collector
 """
 
+import asyncio
+import json
 import requests
-from typing import Dict, Any, Optional, List
-from tenacity import retry, stop_after_attempt, wait_exponential
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date
+from urllib.parse import urlencode
+from typing import Dict, Any, Iterator, Optional, List
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from src.collectors import DataCollector
+from src.collectors.facebook_batch import GraphBatcher
+from src.collectors.facebook_store import FacebookDailySpendStore
+from src.collectors.facebook_throttle import ThrottleError, ThrottleGovernor
 from src.config import Config
+from src.utils.cache import get_response_cache
+from src.utils.http import get_session, run_blocking
 from src.utils.logger import setup_logger
+from src.utils.state import get_state_dir, load_json, save_json
 
 logger = setup_logger('facebook_collector')
 
 class FacebookAdsCollector(DataCollector):
     """Collects data from Facebook Ads API"""
     
+    # Per-ad insights are only needed for debugging
+    output_fields = {
+        'total_spend': True,
+        'total_ads_count': True,
+        'active_ads_count': True,
+        'total_impressions': True,
+        'total_clicks': True,
+        'ads': [{'id': True, 'name': True, 'status': True, 'campaign': True}],
+        'daily_spend': True,
+        'api_usage': True
+    }
+    
     def __init__(self):
         config = Config.get_facebook_config()
         self.access_token = config['access_token']
         self.api_version = config['api_version']
         self.ad_account_id = config['ad_account_id']
         self.base_url = f"https://graph.facebook.com/{self.api_version}"
+        self.cache = get_response_cache()
+        
+        # Accounts that had at least this many ads last run get their lifetime
+        # insights through an async report job instead of one synchronous call
+        self.async_insights_min_ads = config['async_insights_min_ads']
+        self.report_poll_interval = config['report_poll_interval']
+        self.report_timeout = config['report_timeout']
+        self.account_state_path = get_state_dir('facebook') / f"act_{self.ad_account_id}.json"
+        
+        # Lifetime totals are summed from a store of daily insights; only the
+        # last few days, which can still change, are refetched each run
+        self.use_daily_store = config['daily_spend_store']
+        self.settle_days = config['settle_days']
+        self.daily_store = FacebookDailySpendStore(self.ad_account_id)
+        
+        # Concurrent GETs (ads, insights and their follow-up pages) are packed
+        # into Graph API batch requests
+        self.batcher = GraphBatcher(self._send_batch, config['batch_window']) if config['batch_requests'] else None
+        # A caller can wait through a few split-and-resend rounds of its batch
+        self.batch_timeout = config['max_throttle_delay'] + 4 * Config.get_pipeline_config()['http_timeout']
+        
+        # Paces requests from Facebook's usage headers to stay under the throttle
+        self.governor = ThrottleGovernor(config['target_utilization'], config['max_throttle_delay'])
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def _make_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=retry_if_not_exception_type(ThrottleError))
+    def _make_request(self, endpoint: str, params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
         """Make a request to Facebook Ads API with retry logic"""
-        url = f"{self.base_url}/{endpoint}"
-        params['access_token'] = self.access_token
+        cached = self.cache.get('facebook', endpoint, params) if use_cache else None
+        if cached is not None:
+            return cached
         
         logger.info(f"Making request to: {endpoint}")
-        response = requests.get(url, params=params)
+        if self.batcher:
+            data = self._get_batched(endpoint, params)
+        else:
+            url = f"{self.base_url}/{endpoint}"
+            request_params = {**params, 'access_token': self.access_token}
+            self.governor.wait()
+            response = get_session().get(url, params=request_params)
+            self.governor.update(response.headers)
+            
+            if response.status_code != 200:
+                logger.error(f"Facebook API Error: {response.text}")
+                response.raise_for_status()
+            
+            data = response.json()
+        
+        if use_cache:
+            self.cache.put('facebook', endpoint, params, data)
+        return data
+    
+    def _get_batched(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a GET through the batcher and unpack its item of the batch response"""
+        try:
+            item = self.batcher.submit(f"{endpoint}?{urlencode(params)}").result(timeout=self.batch_timeout)
+        except FutureTimeoutError:
+            raise requests.exceptions.Timeout(f"Batched request to {endpoint} did not complete in {self.batch_timeout}s")
+        
+        if item is None:
+            raise requests.exceptions.Timeout(f"Batched request to {endpoint} did not complete")
+        self.governor.update({header['name']: header['value'] for header in item.get('headers') or []})
+        if item.get('code') != 200:
+            logger.error(f"Facebook API Error: {item.get('body')}")
+            raise requests.exceptions.HTTPError(f"{item.get('code')} error for batched request to {endpoint}")
+        
+        return json.loads(item['body'])
+    
+    def _send_batch(self, relative_urls: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Send GETs as one Graph API batch request"""
+        batch = [{'method': 'GET', 'relative_url': relative_url} for relative_url in relative_urls]
+        self.governor.wait()
+        response = get_session().post(
+            f"{self.base_url}/",
+            data={'access_token': self.access_token, 'batch': json.dumps(batch)}
+        )
+        self.governor.update(response.headers)
         
         if response.status_code != 200:
             logger.error(f"Facebook API Error: {response.text}")
@@ -37,6 +128,45 @@ class FacebookAdsCollector(DataCollector):
         
         return response.json()
     
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=retry_if_not_exception_type(ThrottleError))
+    def _post_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Make a POST request to Facebook Ads API with retry logic"""
+        url = f"{self.base_url}/{endpoint}"
+        request_params = {**params, 'access_token': self.access_token}
+        
+        logger.info(f"Making POST request to: {endpoint}")
+        self.governor.wait()
+        response = get_session().post(url, params=request_params)
+        self.governor.update(response.headers)
+        
+        if response.status_code != 200:
+            logger.error(f"Facebook API Error: {response.text}")
+            response.raise_for_status()
+        
+        return response.json()
+    
+    def _iter_edge(self, endpoint: str, params: Dict[str, Any], use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every item of a Graph API edge, following paging cursors
+        
+        Args:
+            endpoint: Edge endpoint, e.g. act_<id>/ads
+            params: Query params for the first page
+            use_cache: Whether pages may be served from the response cache
+            
+        Yields:
+            Dict[str, Any]: Items from each page's data list
+        """
+        while True:
+            page = self._make_request(endpoint, params, use_cache)
+            yield from page.get('data', [])
+            
+            paging = page.get('paging', {})
+            after = paging.get('cursors', {}).get('after')
+            if not paging.get('next') or not after:
+                break
+            params = {**params, 'after': after}
+    
     def _get_ad_status(self, ad_data: Dict[str, Any]) -> str:
         """Get the effective status of an ad"""
         return ad_data.get('effective_status', 'UNKNOWN')
@@ -59,12 +189,11 @@ class FacebookAdsCollector(DataCollector):
             'limit': 1000
         }
         
-        ads_data = self._make_request(endpoint, params)
-        all_ads = ads_data.get('data', [])
-        
         # Log count by status
+        all_ads = []
         status_counts = {}
-        for ad in all_ads:
+        for ad in self._iter_edge(endpoint, params):
+            all_ads.append(ad)
             status = self._get_ad_status(ad)
             status_counts[status] = status_counts.get(status, 0) + 1
         
@@ -72,9 +201,8 @@ class FacebookAdsCollector(DataCollector):
         logger.info(f"Status breakdown: {status_counts}")
         return all_ads
     
-    def _get_ads_insights(self, ad_ids: List[str]) -> List[Dict[str, Any]]:
-        """Get insights for all ads"""
-        endpoint = f"act_{self.ad_account_id}/insights"
+    def _fetch_ads_insights(self) -> Dict[str, Dict[str, Any]]:
+        """Fetch lifetime ad-level insights for the account, indexed by ad id"""
         fields = [
             'ad_id',
             'ad_name',
@@ -90,28 +218,128 @@ class FacebookAdsCollector(DataCollector):
         params = {
             'fields': ','.join(fields),
             'date_preset': 'maximum',
-            'level': 'ad'
+            'level': 'ad',
+            'limit': 1000
         }
         
-        insights_data = self._make_request(endpoint, params)
+        insights_by_ad = {}
+        for insight in self._iter_insights(params):
+            insights_by_ad.setdefault(insight.get('ad_id'), insight)
+        return insights_by_ad
+    
+    def _iter_insights(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Stream ad-level insight rows, through an async report job for large accounts"""
+        if self._use_async_insights():
+            return iter(self._get_report_insights(params))
+        return self._iter_edge(f"act_{self.ad_account_id}/insights", params)
+    
+    def _update_daily_store(self) -> Dict[str, Any]:
+        """
+        Fetch daily insights for the days that are not closed yet and merge them into the store
         
-        # Get insights for all ads
-        all_insights = [
-            insight for insight in insights_data.get('data', [])
-            if insight.get('ad_id') in ad_ids
-        ]
+        Returns:
+            The updated store
+        """
+        store = self.daily_store.load()
+        since = self.daily_store.fetch_since(store)
+        today = date.today()
+        
+        params = {
+            'fields': 'ad_id,ad_name,spend,impressions,clicks',
+            'level': 'ad',
+            'time_increment': 1,
+            'limit': 1000
+        }
+        if since is None:
+            logger.info("Daily spend store is empty, fetching full history")
+            params['date_preset'] = 'maximum'
+        else:
+            logger.info(f"Fetching daily insights since {since.isoformat()}")
+            params['time_range'] = json.dumps({'since': since.isoformat(), 'until': today.isoformat()})
+        
+        self.daily_store.merge(store, self._iter_insights(params), since, today, self.settle_days)
+        self.daily_store.save(store)
+        return store
+    
+    def _use_async_insights(self) -> bool:
+        """Use an async report job when the account had many ads on the last run"""
+        if self.async_insights_min_ads <= 0:
+            return False
+        last_ad_count = load_json(self.account_state_path, {}).get('ad_count', 0)
+        return last_ad_count >= self.async_insights_min_ads
+    
+    def _get_report_insights(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Get insights through an async report job, reading through the response cache"""
+        cached = self.cache.get('facebook', 'async_insights', params)
+        if cached is not None:
+            return cached
         
-        return all_insights
+        insights = list(self._run_insights_report(params))
+        self.cache.put('facebook', 'async_insights', params, insights)
+        return insights
     
-    def collect(self) -> Dict[str, Any]:
+    def _run_insights_report(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Submit an async insights report run and stream its result pages
+        
+        Args:
+            params: Insights query params
+            
+        Yields:
+            Dict[str, Any]: Insight rows
+        """
+        endpoint = f"act_{self.ad_account_id}/insights"
+        report_params = {key: value for key, value in params.items() if key != 'limit'}
+        report_run_id = self._post_request(endpoint, report_params)['report_run_id']
+        logger.info(f"Started async insights report {report_run_id}")
+        
+        self._wait_for_report(report_run_id)
+        yield from self._iter_edge(f"{report_run_id}/insights", {'limit': params.get('limit', 1000)}, use_cache=False)
+    
+    def _wait_for_report(self, report_run_id: str) -> None:
+        """Poll an async report run with backoff until it completes"""
+        delay = self.report_poll_interval
+        deadline = time.monotonic() + self.report_timeout
+        
+        while True:
+            report = self._make_request(
+                report_run_id,
+                {'fields': 'async_status,async_percent_completion'},
+                use_cache=False
+            )
+            status = report.get('async_status')
+            logger.info(f"Insights report {report_run_id}: {status} ({report.get('async_percent_completion', 0)}%)")
+            
+            if status == 'Job Completed':
+                return
+            if status in ('Job Failed', 'Job Skipped'):
+                raise RuntimeError(f"Insights report {report_run_id} ended with status {status}")
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Insights report {report_run_id} did not complete within {self.report_timeout:.0f}s")
+            
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+    
+    async def acollect(self) -> Dict[str, Any]:
         """Collect Facebook Ads data"""
         try:
-            # Get all ads
-            all_ads = self._get_all_ads()
-            ad_ids = [ad['id'] for ad in all_ads]
+            # Ads and insights are independent edges, so fetch both at once
+            if self.use_daily_store:
+                all_ads, store = await asyncio.gather(
+                    run_blocking(self._get_all_ads),
+                    run_blocking(self._update_daily_store)
+                )
+                insights_by_ad = self.daily_store.lifetime_insights(store)
+                daily_spend = self.daily_store.daily_spend(store)
+            else:
+                all_ads, insights_by_ad = await asyncio.gather(
+                    run_blocking(self._get_all_ads),
+                    run_blocking(self._fetch_ads_insights)
+                )
+                daily_spend = []
             
             # Get insights for all ads
-            insights = self._get_ads_insights(ad_ids)
+            insights = [insights_by_ad[ad['id']] for ad in all_ads if ad['id'] in insights_by_ad]
             
             # Calculate total spend - directly use spend values without conversion
             total_spend = sum(
@@ -123,6 +351,8 @@ class FacebookAdsCollector(DataCollector):
             for insight in insights:
                 logger.info(f"Ad '{insight.get('ad_name')}' spend: ${float(insight.get('spend', '0')):.2f}")
             
+            save_json(self.account_state_path, {'ad_count': len(all_ads)})
+            
             # Count active ads
             active_ads_count = sum(1 for ad in all_ads if self._get_ad_status(ad) == 'ACTIVE')
             
@@ -138,16 +368,15 @@ class FacebookAdsCollector(DataCollector):
                     'name': ad['name'],
                     'status': self._get_ad_status(ad),
                     'campaign': ad.get('campaign', {}).get('name', 'N/A'),
-                    'metrics': next(
-                        (m for m in insights if m['ad_id'] == ad['id']),
-                        {}
-                    )
-                } for ad in all_ads]
+                    'metrics': insights_by_ad.get(ad['id'], {})
+                } for ad in all_ads],
+                'daily_spend': daily_spend,
+                'api_usage': self.governor.metrics()
             }
             
             if self.validate_data(data):
                 logger.info("Successfully collected Facebook Ads data")
-                return data
+                return self.project(data)
             else:
                 raise ValueError("Collected data failed validation")
                 
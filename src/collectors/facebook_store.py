@@ -0,0 +1,98 @@
+"""
+Local store of daily Facebook Ads insights
+"""
+
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+from src.utils.state import get_state_dir, load_json, save_json
+
+class FacebookDailySpendStore:
+    """Persists per-ad daily insights; days older than the settle window are never refetched"""
+
+    def __init__(self, ad_account_id: str, directory: Optional[Path] = None):
+        directory = Path(directory) if directory else get_state_dir('facebook')
+        self.path = directory / f"daily_act_{ad_account_id}.json"
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Load the store
+
+        Returns:
+            Dict with 'closed_through' (last day whose insights are final, or
+            None) and 'days' (date -> ad id -> daily insight)
+        """
+        return load_json(self.path) or {'closed_through': None, 'days': {}}
+
+    def save(self, store: Dict[str, Any]) -> None:
+        """Persist the store"""
+        save_json(self.path, store)
+
+    @staticmethod
+    def fetch_since(store: Dict[str, Any]) -> Optional[date]:
+        """First day that still needs fetching, or None if nothing is stored yet"""
+        if not store['closed_through']:
+            return None
+        return date.fromisoformat(store['closed_through']) + timedelta(days=1)
+
+    @staticmethod
+    def merge(store: Dict[str, Any], rows: Iterable[Dict[str, Any]], since: Optional[date], today: date, settle_days: int) -> None:
+        """
+        Replace the refetched days with new daily rows and close settled days
+
+        Args:
+            store: Store from load()
+            rows: Daily insight rows (time_increment=1) for since..today
+            since: First refetched day, or None if everything was refetched
+            today: Last refetched day
+            settle_days: Days before today whose insights may still change
+        """
+        days = store['days']
+        if since is None:
+            days.clear()
+        else:
+            for day in [day for day in days if day >= since.isoformat()]:
+                del days[day]
+
+        for row in rows:
+            day = row['date_start']
+            days.setdefault(day, {})[row['ad_id']] = {
+                'ad_name': row.get('ad_name'),
+                'spend': float(row.get('spend', 0)),
+                'impressions': int(row.get('impressions', 0)),
+                'clicks': int(row.get('clicks', 0))
+            }
+
+        store['closed_through'] = (today - timedelta(days=settle_days)).isoformat()
+
+    @staticmethod
+    def lifetime_insights(store: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Sum the stored days into lifetime insights per ad"""
+        insights_by_ad = {}
+        for day in sorted(store['days']):
+            for ad_id, row in store['days'][day].items():
+                insight = insights_by_ad.setdefault(ad_id, {
+                    'ad_id': ad_id,
+                    'ad_name': row['ad_name'],
+                    'spend': 0.0,
+                    'impressions': 0,
+                    'clicks': 0
+                })
+                insight['spend'] += row['spend']
+                insight['impressions'] += row['impressions']
+                insight['clicks'] += row['clicks']
+
+        for insight in insights_by_ad.values():
+            insight['spend'] = round(insight['spend'], 2)
+            insight['ctr'] = insight['clicks'] / insight['impressions'] * 100 if insight['impressions'] else 0
+            insight['cpc'] = insight['spend'] / insight['clicks'] if insight['clicks'] else 0
+        return insights_by_ad
+
+    @staticmethod
+    def daily_spend(store: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Get the account's total spend per day"""
+        return [
+            {'date': day, 'spend': round(sum(row['spend'] for row in ads.values()), 2)}
+            for day, ads in sorted(store['days'].items())
+        ]
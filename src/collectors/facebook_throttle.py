@@ -0,0 +1,113 @@
+"""
+Usage-header-driven request pacing for the Facebook Ads collector
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Mapping
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger('facebook_throttle')
+
+class ThrottleError(Exception):
+    """Raised when Facebook blocks access for longer than the pacing delay cap"""
+
+class ThrottleGovernor:
+    """
+    Paces Graph API calls from the usage headers Facebook returns
+
+    After every response the X-Business-Use-Case-Usage, X-Ad-Account-Usage and
+    X-App-Usage headers are parsed into one utilization percentage (the highest
+    of all reported counters). Once utilization passes the target, each new
+    request is delayed in proportion to how far over the target it is. When
+    Facebook reports an estimated time to regain access, requests wait out
+    that time instead of tripping the hard throttle, unless it is longer than
+    max_delay: then they fail with ThrottleError rather than hold a worker
+    for minutes, and the collection falls back to its last known good data.
+    """
+
+    def __init__(self, target_utilization: float = 75.0, max_delay: float = 60.0):
+        self.target_utilization = target_utilization
+        self.max_delay = max_delay
+        self.utilization = 0.0
+        self.peak_utilization = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """
+        Block until the next request may be sent
+
+        Raises:
+            ThrottleError: If access is blocked for longer than max_delay
+        """
+        with self._lock:
+            delay = max(0.0, self._blocked_until - time.monotonic())
+            if delay > self.max_delay:
+                raise ThrottleError(f"Facebook API access blocked for another {delay / 60:.1f} minutes")
+            if self.utilization > self.target_utilization:
+                headroom = max(1.0, 100.0 - self.target_utilization)
+                delay = max(delay, self.max_delay * min(1.0, (self.utilization - self.target_utilization) / headroom))
+
+        if delay > 0:
+            logger.warning(f"Facebook API utilization at {self.utilization:.0f}%, pausing {delay:.1f}s")
+            time.sleep(delay)
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Record the usage reported by a response
+
+        Args:
+            headers: Response headers (any mapping with case-sensitive or
+                case-insensitive keys)
+        """
+        usages = []
+        regain_minutes = 0.0
+        lowered = {key.lower(): value for key, value in headers.items()}
+
+        app_usage = self._parse(lowered.get('x-app-usage'))
+        usages.extend(float(value) for key, value in app_usage.items() if key in ('call_count', 'total_cputime', 'total_time'))
+
+        account_usage = self._parse(lowered.get('x-ad-account-usage'))
+        if 'acc_id_util_pct' in account_usage:
+            usages.append(float(account_usage['acc_id_util_pct']))
+            if float(account_usage['acc_id_util_pct']) >= 100:
+                regain_minutes = max(regain_minutes, float(account_usage.get('reset_time_duration', 0)) / 60)
+
+        business_usage = self._parse(lowered.get('x-business-use-case-usage'))
+        for entries in business_usage.values():
+            for entry in entries if isinstance(entries, list) else []:
+                usages.extend(float(entry.get(key, 0)) for key in ('call_count', 'total_cputime', 'total_time'))
+                regain_minutes = max(regain_minutes, float(entry.get('estimated_time_to_regain_access', 0)))
+
+        if not usages and not regain_minutes:
+            return
+
+        with self._lock:
+            self.utilization = max(usages) if usages else self.utilization
+            self.peak_utilization = max(self.peak_utilization, self.utilization)
+            if regain_minutes:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + regain_minutes * 60)
+
+        if regain_minutes:
+            logger.warning(f"Facebook API throttled, access regained in {regain_minutes:.1f} minutes")
+
+    def metrics(self) -> Dict[str, float]:
+        """Current and peak utilization in percent"""
+        return {
+            'utilization': round(self.utilization, 2),
+            'peak_utilization': round(self.peak_utilization, 2),
+            'target_utilization': self.target_utilization
+        }
+
+    @staticmethod
+    def _parse(value: Any) -> Dict[str, Any]:
+        if not value:
+            return {}
+        try:
+            parsed = json.loads(value)
+        except (TypeError, ValueError):
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
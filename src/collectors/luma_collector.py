@@ -2,14 +2,17 @@
 Luma events data collector
 """
 
-import requests
-from typing import Dict, Any, List
-from datetime import datetime, timezone
+import asyncio
+from typing import Dict, Any, Iterator, List, Optional
+from datetime import datetime, timedelta, timezone
 from tenacity import retry, stop_after_attempt, wait_exponential
 from collections import defaultdict
 
 from src.collectors import DataCollector
+from src.collectors.luma_store import LumaEventStore, parse_timestamp
 from src.config import Config
+from src.utils.cache import get_response_cache
+from src.utils.http import RequestPacer, get_session, retry_after_seconds, run_blocking
 from src.utils.logger import setup_logger
 
 logger = setup_logger('luma_collector')
@@ -22,6 +25,7 @@ class LumaCollector(DataCollector):
         self.api_key = config['api_key']
         self.base_url = config['base_url']
         self.headers = {"x-luma-api-key": self.api_key}
+        self.cache = get_response_cache()
         
         # List of event IDs to track
         self.track_events = ["evt-D6W6FYFZRzIvtGL", "evt-rsCQjpjQszHb0tP"]
@@ -36,83 +40,275 @@ class LumaCollector(DataCollector):
         
         # Track guest data for LTV calculation
         self.guest_history = {}  # guest_email -> List[Dict] of event participation
+        
+        # Incremental ingestion keeps each event's paid guests on disk and only
+        # fetches registrations newer than the stored watermark
+        self.incremental = config['incremental']
+        self.watermark_lookback_hours = config['watermark_lookback_hours']
+        
+        # Events that ended more than this many days ago are frozen in the store
+        self.freeze_grace_days = config['freeze_grace_days']
+        
+        self.page_size = config['page_size']
+        
+        # Per-event guest fetches run in parallel up to this cap, with request
+        # starts paced to stay under Luma's rate limit
+        self.max_concurrent_events = config['max_concurrent_events']
+        self.pacer = RequestPacer(config['requests_per_second'])
+        self.event_store = LumaEventStore()
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def _make_request(self, endpoint: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Make a request to Luma API with retry logic"""
+        cached = self.cache.get('luma', endpoint, params)
+        if cached is not None:
+            return cached
+        
         url = f"{self.base_url}/{endpoint}"
         
+        self.pacer.wait()
         logger.info(f"Making request to: {endpoint}")
-        response = requests.get(url, headers=self.headers, params=params)
+        response = get_session().get(url, headers=self.headers, params=params)
+        
+        if response.status_code == 429:
+            backoff = retry_after_seconds(response)
+            logger.warning(f"Luma rate limit hit, pausing requests for {backoff:.1f}s")
+            self.pacer.pause(backoff)
         
         if response.status_code != 200:
             logger.error(f"Luma API Error: {response.text}")
             response.raise_for_status()
         
-        return response.json()
+        data = response.json()
+        self.cache.put('luma', endpoint, params, data)
+        return data
     
-    def _get_event_guests_and_revenue(self, event_id):
-        guests_by_date = defaultdict(lambda: {'amount': 0, 'tickets': 0})
+    def _iter_entries(self, endpoint: str, params: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the entries of a paginated Luma endpoint, following next_cursor
+        
+        Only one page is held at a time, so callers that reduce entries as they
+        arrive keep memory flat regardless of the total entry count.
         
+        Args:
+            endpoint: API endpoint
+            params: Query params for the first page
+            
+        Yields:
+            Dict[str, Any]: Raw entries
+        """
+        params = {**(params or {}), "pagination_limit": self.page_size}
+        
+        while True:
+            page = self._make_request(endpoint, params)
+            yield from page.get("entries", [])
+            
+            cursor = page.get("next_cursor")
+            if not page.get("has_more") or not cursor:
+                break
+            params = {**params, "pagination_cursor": cursor}
+    
+    def _fetch_events(self) -> List[Dict[str, Any]]:
+        """Fetch all calendar events, keeping only the fields we use"""
+        event_fields = ("api_id", "name", "start_at", "end_at")
+        return [
+            {field: entry.get("event", {}).get(field) for field in event_fields}
+            for entry in self._iter_entries("calendar/list-events")
+        ]
+    
+    def _fetch_event_guests(self, event_id: str) -> List[Dict[str, Any]]:
+        """Fetch the guest records for a single event"""
         endpoint = "event/get-guests"
         params = {"event_api_id": event_id}
         
-        guests_data = self._make_request(endpoint, params)
-        entries = guests_data.get("entries", [])
+        guests = (self._parse_guest_entry(entry) for entry in self._iter_entries(endpoint, params))
+        return [guest for guest in guests if guest]
+    
+    def _fetch_event_guests_since(self, event_id: str, watermark: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch the guest records registered since an event's watermark
+        
+        Guests are requested newest first, so paging stops at the first entry
+        older than the watermark minus the lookback window.
         
-        for entry in entries:
-            guest = entry.get("guest", {})
-            email = guest.get("email")
-            tickets = guest.get("event_tickets", [])
+        Args:
+            event_id: Luma event API id
+            watermark: Latest registered_at already stored, or None for a full fetch
             
-            if tickets and email:
-                total_amount = sum(ticket.get("amount", 0) for ticket in tickets)
-                
-                # Skip free tickets
-                if total_amount == 0:
-                    logger.info(f"Skipping free registration for {email}")
-                    continue
-                
-                ticket_count = len(tickets)
-                single_ticket_amount = total_amount // ticket_count if ticket_count > 0 else 0
-                
-                purchase_date = datetime.fromisoformat(guest.get("registered_at", "").replace('Z', '+00:00')).date()
-                
-                # Update daily revenue with total amount
-                guests_by_date[purchase_date]['amount'] += total_amount
-                guests_by_date[purchase_date]['tickets'] += ticket_count
-                
-                logger.info(f"Guest data: Email={email}, Tickets={ticket_count}")
-                logger.info(f"Guest details: {guest}")
-                
-                # Track this event participation for the guest's LTV
-                if email not in self.guest_history:
-                    self.guest_history[email] = {'events': {}, 'total_spend': 0}
-                
-                # Only add if this is a new event for this guest
-                if event_id not in self.guest_history[email]['events']:
-                    self.guest_history[email]['events'][event_id] = {
-                        'amount': single_ticket_amount,  # Store single ticket amount for LTV
-                        'tickets': ticket_count,
-                        'date': purchase_date
-                    }
-                    # Update total spend with single ticket amount
-                    self.guest_history[email]['total_spend'] = sum(
-                        e['amount'] for e in self.guest_history[email]['events'].values()
-                    )
-                    logger.info(f"Added event {event_id} to guest {email}'s history. Single ticket amount: ${single_ticket_amount/100:.2f}")
+        Returns:
+            List of guest records, newest first
+        """
+        endpoint = "event/get-guests"
+        params = {
+            "event_api_id": event_id,
+            "sort_column": "registered_at",
+            "sort_direction": "desc"
+        }
+        
+        cutoff = parse_timestamp(watermark) - timedelta(hours=self.watermark_lookback_hours) if watermark else None
+        new_guests = []
+        for entry in self._iter_entries(endpoint, params):
+            registered_at = entry.get("guest", {}).get("registered_at")
+            if cutoff and registered_at and parse_timestamp(registered_at) < cutoff:
+                break
+            guest = self._parse_guest_entry(entry)
+            if guest:
+                new_guests.append(guest)
+        
+        logger.info(f"Fetched {len(new_guests)} new or recent registrations for event {event_id}")
+        return new_guests
+    
+    def _get_event_guests_and_revenue(self, event_id):
+        return self._fold_event_guests(event_id, self._fetch_event_guests(event_id))
+    
+    def _parse_guest_entry(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Reduce a guest entry to the fields used for sales and LTV
+        
+        A registration without tickets (refunded or cancelled) yields a
+        zero-amount record, so merging it removes the stored paid guest.
+        
+        Returns:
+            Guest record, or None if the entry has no email
+        """
+        guest = entry.get("guest", {})
+        email = guest.get("email")
+        tickets = guest.get("event_tickets") or []
+        registered_at = guest.get("registered_at", "")
+        
+        if not email:
+            return None
+        
+        return {
+            "key": guest.get("api_id") or email,
+            "email": email,
+            "amount": sum(ticket.get("amount", 0) for ticket in tickets),
+            "tickets": len(tickets),
+            "date": str(parse_timestamp(registered_at).date()),
+            "registered_at": registered_at
+        }
+    
+    def _fold_event_guests(self, event_id: str, guests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fold an event's guest records into daily sales and the guest LTV history"""
+        guests_by_date = defaultdict(lambda: {'amount': 0, 'tickets': 0})
+        
+        for guest in guests:
+            email = guest["email"]
+            total_amount = guest["amount"]
+            
+            # Skip free tickets
+            if total_amount == 0:
+                logger.info(f"Skipping free registration for {email}")
+                continue
+            
+            ticket_count = guest["tickets"]
+            single_ticket_amount = total_amount // ticket_count if ticket_count > 0 else 0
+            
+            purchase_date = guest["date"]
+            
+            # Update daily revenue with total amount
+            guests_by_date[purchase_date]['amount'] += total_amount
+            guests_by_date[purchase_date]['tickets'] += ticket_count
+            
+            logger.info(f"Guest data: Email={email}, Tickets={ticket_count}")
+            
+            # Track this event participation for the guest's LTV
+            if email not in self.guest_history:
+                self.guest_history[email] = {'events': {}, 'total_spend': 0}
+            
+            # Only add if this is a new event for this guest
+            if event_id not in self.guest_history[email]['events']:
+                self.guest_history[email]['events'][event_id] = {
+                    'amount': single_ticket_amount,  # Store single ticket amount for LTV
+                    'tickets': ticket_count,
+                    'date': purchase_date
+                }
+                # Update total spend with single ticket amount
+                self.guest_history[email]['total_spend'] = sum(
+                    e['amount'] for e in self.guest_history[email]['events'].values()
+                )
+                logger.info(f"Added event {event_id} to guest {email}'s history. Single ticket amount: ${single_ticket_amount/100:.2f}")
         
         # Convert to list of daily sales
         daily_sales = []
         for date, data in guests_by_date.items():
             daily_sales.append({
-                "date": str(date),
+                "date": date,
                 "revenue": data["amount"],
                 "tickets": data["tickets"]
             })
         
         return daily_sales
     
+    def _event_finished(self, event: Dict[str, Any], now: datetime) -> bool:
+        """Check whether an event ended more than the freeze grace period ago"""
+        end_at = event.get("end_at") or event.get("start_at")
+        if not end_at:
+            return False
+        return parse_timestamp(end_at) + timedelta(days=self.freeze_grace_days) < now
+    
+    async def _acollect_event_sales(self, events: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Fetch and fold the guests of each event, returning daily sales in event order
+        
+        Events that finished more than the grace period ago are fetched in full
+        one last time and then frozen in the event store, so later runs skip
+        their API calls.
+        """
+        now = datetime.now(timezone.utc)
+        records = {event["api_id"]: self.event_store.load(event["api_id"]) for event in events}
+        
+        to_fetch = []
+        for event in events:
+            record = records[event["api_id"]]
+            if record.get("frozen_at"):
+                logger.info(f"Using frozen aggregates for finished event {event['api_id']}")
+            else:
+                to_fetch.append(event)
+        
+        # Fetch guests for live events in parallel, then fold them in calendar
+        # order so the merge is deterministic and guest_history is only ever
+        # touched from the event loop
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_events))
+        
+        async def fetch(event: Dict[str, Any]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                # The last fetch before freezing is always a full one, so
+                # refunds older than the lookback window are not frozen in
+                if self.incremental and not self._event_finished(event, now):
+                    watermark = records[event["api_id"]]["watermark"]
+                    return await run_blocking(self._fetch_event_guests_since, event["api_id"], watermark)
+                return await run_blocking(self._fetch_event_guests, event["api_id"])
+        
+        fetched_guests = await asyncio.gather(*(fetch(event) for event in to_fetch))
+        
+        for event, guests in zip(to_fetch, fetched_guests):
+            record = records[event["api_id"]]
+            
+            finished = self._event_finished(event, now)
+            if not self.incremental or finished:
+                # A full fetch replaces whatever was stored before
+                record["guests"] = {}
+            changed = self.event_store.merge(record, guests)
+            
+            if finished:
+                record["frozen_at"] = now.isoformat()
+                logger.info(f"Freezing aggregates for finished event {event['api_id']}")
+            
+            if (self.incremental and guests) or record.get("frozen_at"):
+                self.event_store.save(record)
+                logger.info(f"Merged {changed} changed registrations into event {event['api_id']}")
+        
+        # Fold in registration order so a guest's first registration for an
+        # event is the one counted for LTV, however the guests were fetched
+        return [
+            self._fold_event_guests(
+                event["api_id"],
+                sorted(records[event["api_id"]]["guests"].values(), key=lambda guest: guest["registered_at"])
+            )
+            for event in events
+        ]
+    
     def _calculate_ltv_metrics(self) -> Dict[str, Any]:
         """Calculate LTV metrics from guest history"""
         if not self.guest_history:
@@ -143,14 +339,13 @@ class LumaCollector(DataCollector):
             "repeat_guest_percentage": (repeat_guests / total_unique_guests * 100) if total_unique_guests > 0 else 0
         }
     
-    def collect(self) -> Dict[str, Any]:
+    async def acollect(self) -> Dict[str, Any]:
         """Collect Luma events data"""
         try:
             # Get list of all events
-            events_data = self._make_request("calendar/list-events")
-            entries = events_data.get("entries", [])
+            calendar_events = await run_blocking(self._fetch_events)
             
-            if not entries:
+            if not calendar_events:
                 logger.warning("No events found")
                 return self._create_empty_data()
             
@@ -158,8 +353,8 @@ class LumaCollector(DataCollector):
             sales_by_date = {}
             current_time = datetime.utcnow().isoformat() + "Z"
             
-            for entry in entries:
-                event = entry.get("event", {})
+            events = []
+            for event in calendar_events:
                 event_id = event.get("api_id")
                 
                 if not event_id:
@@ -173,20 +368,21 @@ class LumaCollector(DataCollector):
                 # Process if event is in track list or is a new event
                 if event_id in self.track_events or (event_id not in self.track_events and event_id not in self.ignore_events):
                     logger.info(f"Processing event: {event.get('name', 'Unnamed Event')} ({event_id})")
-                    daily_sales = self._get_event_guests_and_revenue(event_id)
-                    
-                    for sale in daily_sales:
-                        date = sale["date"]
-                        if date in sales_by_date:
-                            sales_by_date[date]["daily_revenue"] += sale["revenue"]
-                            sales_by_date[date]["daily_guests"] += sale["tickets"]
-                            sales_by_date[date]["event_count"] += 1
-                        else:
-                            sales_by_date[date] = {
-                                "daily_revenue": sale["revenue"],
-                                "daily_guests": sale["tickets"],
-                                "event_count": 1
-                            }
+                    events.append(event)
+            
+            for daily_sales in await self._acollect_event_sales(events):
+                for sale in daily_sales:
+                    date = sale["date"]
+                    if date in sales_by_date:
+                        sales_by_date[date]["daily_revenue"] += sale["revenue"]
+                        sales_by_date[date]["daily_guests"] += sale["tickets"]
+                        sales_by_date[date]["event_count"] += 1
+                    else:
+                        sales_by_date[date] = {
+                            "daily_revenue": sale["revenue"],
+                            "daily_guests": sale["tickets"],
+                            "event_count": 1
+                        }
             
             # Calculate LTV metrics
             ltv_metrics = self._calculate_ltv_metrics()
@@ -0,0 +1,82 @@
+"""
+Local store of per-event Luma guest aggregates
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from src.utils.state import get_state_dir, load_json, save_json
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a Luma ISO timestamp"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+class LumaEventStore:
+    """Persists the paid guests of each event with a registered_at watermark"""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else get_state_dir('luma', 'events')
+
+    def _path(self, event_id: str) -> Path:
+        return self.directory / f"{event_id}.json"
+
+    def load(self, event_id: str) -> Dict[str, Any]:
+        """
+        Load an event's stored guests
+
+        Args:
+            event_id: Luma event API id
+
+        Returns:
+            Dict with 'event_id', 'watermark' (latest registered_at seen),
+            'guests' (guest key -> guest record) and 'frozen_at' (set once the
+            event has finished and its guests will no longer be fetched)
+        """
+        record = load_json(self._path(event_id))
+        if not record:
+            record = {'event_id': event_id, 'watermark': None, 'guests': {}, 'frozen_at': None}
+        return record
+
+    def save(self, record: Dict[str, Any]) -> None:
+        """Persist an event record"""
+        save_json(self._path(record['event_id']), record)
+
+    @staticmethod
+    def merge(record: Dict[str, Any], guests: List[Dict[str, Any]]) -> int:
+        """
+        Upsert guest records into an event record and advance its watermark
+
+        Guests whose tickets no longer carry an amount are removed, so a
+        re-fetched registration always replaces what was stored before.
+
+        Args:
+            record: Event record from load()
+            guests: Guest records produced by LumaCollector._parse_guest_entry
+
+        Returns:
+            int: Number of guests added, changed or removed
+        """
+        changed = 0
+        watermark = parse_timestamp(record['watermark']) if record['watermark'] else None
+
+        for guest in guests:
+            key = guest['key']
+            stored = record['guests'].get(key)
+
+            if guest['amount'] > 0:
+                value = {field: guest[field] for field in ('email', 'amount', 'tickets', 'date', 'registered_at')}
+                if stored != value:
+                    record['guests'][key] = value
+                    changed += 1
+            elif stored is not None:
+                del record['guests'][key]
+                changed += 1
+
+            registered_at = parse_timestamp(guest['registered_at'])
+            if watermark is None or registered_at > watermark:
+                watermark = registered_at
+
+        if watermark is not None:
+            record['watermark'] = watermark.isoformat()
+        return changed
@@ -1,5 +1,5 @@
 import os
-from typing import Dict
+from typing import Dict, Any
 
 class Config:
     """Configuration management for the application"""
@@ -15,6 +15,12 @@ class Config:
     VERCEL_API_URL = os.getenv('VERCEL_API_URL')
     API_KEY = os.getenv('API_KEY')
     
+    # Local state (caches, stores, last-known-good outputs)
+    STATE_DIR = os.getenv(
+        'DASHBOARD_STATE_DIR',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+    )
+    
     @classmethod
     def validate_env(cls) -> None:
         """Validate all required environment variables are set"""
@@ -37,22 +43,87 @@ class Config:
             )
     
     @classmethod
-    def get_facebook_config(cls) -> Dict[str, str]:
+    def get_facebook_config(cls) -> Dict[str, Any]:
         """Get Facebook-specific configuration"""
         cls.validate_env()
         return {
             'access_token': os.getenv('YADIN_FACEBOOK_ADS_TOKEN'),
             'api_version': 'v19.0',
-            'ad_account_id': '1770605100340015'  # Facebook Ad Account ID
+            'ad_account_id': '1770605100340015',  # Facebook Ad Account ID
+            'async_insights_min_ads': int(os.getenv('FACEBOOK_ASYNC_INSIGHTS_MIN_ADS', '500')),
+            'report_poll_interval': float(os.getenv('FACEBOOK_REPORT_POLL_INTERVAL', '2')),
+            'report_timeout': float(os.getenv('FACEBOOK_REPORT_TIMEOUT', '600')),
+            'daily_spend_store': os.getenv('FACEBOOK_DAILY_SPEND_STORE', 'true').lower() != 'false',
+            'settle_days': int(os.getenv('FACEBOOK_SETTLE_DAYS', '3')),
+            'batch_requests': os.getenv('FACEBOOK_BATCH_REQUESTS', 'true').lower() != 'false',
+            'batch_window': float(os.getenv('FACEBOOK_BATCH_WINDOW_MS', '50')) / 1000,
+            'target_utilization': float(os.getenv('FACEBOOK_TARGET_UTILIZATION', '75')),
+            'max_throttle_delay': float(os.getenv('FACEBOOK_MAX_THROTTLE_DELAY', '60'))
         }
 
     @classmethod
-    def get_luma_config(cls) -> Dict[str, str]:
+    def get_luma_config(cls) -> Dict[str, Any]:
         """Get Luma-specific configuration"""
         cls.validate_env()
         return {
             'api_key': os.getenv('LUMA_API_KEY'),
-            'base_url': 'https://api.lu.ma/public/v1'
+            'base_url': 'https://api.lu.ma/public/v1',
+            'incremental': os.getenv('LUMA_INCREMENTAL', 'true').lower() != 'false',
+            'watermark_lookback_hours': float(os.getenv('LUMA_WATERMARK_LOOKBACK_HOURS', '48')),
+            'freeze_grace_days': float(os.getenv('LUMA_FREEZE_GRACE_DAYS', '3')),
+            'page_size': int(os.getenv('LUMA_PAGE_SIZE', '100')),
+            'max_concurrent_events': int(os.getenv('LUMA_MAX_CONCURRENT_EVENTS', '4')),
+            'requests_per_second': float(os.getenv('LUMA_REQUESTS_PER_SECOND', '5'))
+        }
+    
+    @classmethod
+    def get_divvy_config(cls) -> Dict[str, Any]:
+        """Get Divvy-specific configuration"""
+        return {
+            'base_url': 'https://gateway.prod.bill.com/connect/v3',
+            'default_days': int(os.getenv('DIVVY_DEFAULT_DAYS', '90')),
+            'page_size': int(os.getenv('DIVVY_PAGE_SIZE', '100')),
+            'ledger': os.getenv('DIVVY_LEDGER', 'true').lower() != 'false',
+            'settle_days': int(os.getenv('DIVVY_SETTLE_DAYS', '7'))
+        }
+    
+    @classmethod
+    def get_bucketlister_config(cls) -> Dict[str, Any]:
+        """Get Bucketlister-specific configuration"""
+        return {
+            'refresh_url': os.getenv('BUCKETLISTER_REFRESH_URL', 'https://insights.bucketlisters.com/v2/1045/'),
+            'refresh_margin': float(os.getenv('BUCKETLISTER_REFRESH_MARGIN', '600')),
+            'window_days': int(os.getenv('BUCKETLISTER_WINDOW_DAYS', '14'))
+        }
+    
+    @classmethod
+    def get_pipeline_config(cls) -> Dict[str, Any]:
+        """Get pipeline orchestration configuration"""
+        return {
+            'concurrent_collection': os.getenv('PIPELINE_CONCURRENT_COLLECTION', 'true').lower() != 'false',
+            'max_workers': int(os.getenv('PIPELINE_MAX_WORKERS', '4')),
+            'source_deadline': float(os.getenv('PIPELINE_SOURCE_DEADLINE', '120')),
+            # Per-source overrides; Facebook's covers its async insights report (FACEBOOK_REPORT_TIMEOUT)
+            'source_deadlines': {
+                'facebook': float(os.getenv('FACEBOOK_SOURCE_DEADLINE', '660'))
+            },
+            'http_timeout': float(os.getenv('PIPELINE_HTTP_TIMEOUT', '30')),
+            'include_raw': os.getenv('PIPELINE_INCLUDE_RAW', 'false').lower() == 'true'
+        }
+    
+    @classmethod
+    def get_cache_config(cls) -> Dict[str, Any]:
+        """Get raw response cache configuration (TTLs in seconds, 0 disables)"""
+        return {
+            'enabled': os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() != 'false',
+            # Expired entries are kept this long for conditional revalidation, then deleted
+            'retention': float(os.getenv('RESPONSE_CACHE_RETENTION', '86400')),
+            'ttl': {
+                'facebook': float(os.getenv('FACEBOOK_CACHE_TTL', '300')),
+                'luma': float(os.getenv('LUMA_CACHE_TTL', '300')),
+                'divvy': float(os.getenv('DIVVY_CACHE_TTL', '300')),
+                'bucketlister': float(os.getenv('BUCKETLISTER_CACHE_TTL', '300'))
+            }
         }
     
     @classmethod
@@ -3,20 +3,27 @@ Main orchestrator for the Maayan Dashboard data pipeline
 """
 
 import sys
-from datetime import datetime
-from typing import Dict, Any
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
 import requests
 import json
 
+from src.collectors import DataCollector
 from src.collectors.facebook_collector import FacebookAdsCollector
 from src.collectors.luma_collector import LumaCollector
-from src.collectors.bucketlister import get_tickets_sold, bucketlister_daily
+from src.collectors.bucketlister import BucketlisterCollector
 from src.collectors.divvy_collector import DivvyCollector
 from src.calculator.metrics_calculator import MetricsCalculator
 from src.integrations.geckoboard.client import DashboardClient
 from src.integrations.geckoboard.datasets import transform_metrics_for_geckoboard, transform_daily_metrics_for_geckoboard
 from src.config import Config
+from src.utils.http import cancel_scope
 from src.utils.logger import setup_logger
+from src.utils.snapshot import save_latest_metrics
+from src.utils.state import LastKnownGoodStore, RunLock
 
 logger = setup_logger('main')
 
@@ -27,50 +34,196 @@ def initialize_collectors():
         fb_collector = FacebookAdsCollector()
         luma_collector = LumaCollector()
         divvy_collector = DivvyCollector()
+        bucketlister_collector = BucketlisterCollector()
         calculator = MetricsCalculator()
         dashboard = DashboardClient()
         
-        return fb_collector, luma_collector, divvy_collector, calculator, dashboard
+        return fb_collector, luma_collector, divvy_collector, bucketlister_collector, calculator, dashboard
     except Exception as e:
         logger.error(f"Failed to initialize collectors: {str(e)}")
         raise
 
-def collect_and_process_data() -> Dict[str, Any]:
+async def _acollect_source(source: str, collector: DataCollector, deadline: float, fallback_store: Optional[LastKnownGoodStore]) -> Tuple[Any, float, Dict[str, Any]]:
+    """
+    Collect a single source within its deadline, falling back to its last known good output
+    
+    Args:
+        source: Source name
+        collector: Collector for the source
+        deadline: Seconds the collection may take
+        fallback_store: Store of last successful outputs, or None to disable fallback
+        
+    Returns:
+        Tuple of (data, wall time in seconds, freshness info)
+    """
+    logger.info(f"Collecting {source} data...")
+    start = time.monotonic()
+    with cancel_scope() as cancelled:
+        try:
+            result = await asyncio.wait_for(collector.acollect(), timeout=deadline)
+        except Exception as e:
+            # Stop the blocking calls the abandoned collection still has running
+            cancelled.set()
+            elapsed = time.monotonic() - start
+            reason = f"exceeded {deadline:.0f}s deadline" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.error(f"Failed to collect {source} data after {elapsed:.2f}s: {reason}")
+            
+            cached = fallback_store.load(source) if fallback_store else None
+            if cached is None:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise TimeoutError(f"{source} collection {reason}") from e
+                raise
+            
+            logger.warning(f"Using last known good {source} data from {cached['collected_at']}")
+            return cached['data'], elapsed, {
+                'stale': True,
+                'collected_at': cached['collected_at'],
+                'error': reason
+            }
+    
+    elapsed = time.monotonic() - start
+    logger.info(f"Successfully collected {source} data in {elapsed:.2f}s")
+    
+    if fallback_store:
+        try:
+            fallback_store.save(source, result)
+        except Exception as e:
+            logger.warning(f"Could not store last known good {source} data: {str(e)}")
+    
+    return result, elapsed, {
+        'stale': False,
+        'collected_at': datetime.now(timezone.utc).isoformat(),
+        'error': None
+    }
+
+async def acollect_sources(sources: Dict[str, DataCollector], concurrent: bool = True, deadline: float = 120, fallback_store: Optional[LastKnownGoodStore] = None, source_deadlines: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, Dict[str, Any]]]:
+    """
+    Collect data from all sources on the running event loop
+    
+    Args:
+        sources: Mapping of source name to collector
+        concurrent: Whether to run the collections in parallel
+        deadline: Seconds each source may take
+        fallback_store: Store of last successful outputs, or None to disable fallback
+        source_deadlines: Optional per-source overrides of the deadline
+        
+    Returns:
+        Tuple of (results, wall time in seconds, freshness info), each keyed by source
+    """
+    deadlines = source_deadlines or {}
+    if concurrent:
+        outcomes = await asyncio.gather(
+            *(_acollect_source(source, collector, deadlines.get(source, deadline), fallback_store) for source, collector in sources.items())
+        )
+    else:
+        outcomes = []
+        for source, collector in sources.items():
+            outcomes.append(await _acollect_source(source, collector, deadlines.get(source, deadline), fallback_store))
+    
+    results = {}
+    timings = {}
+    freshness = {}
+    for source, (result, elapsed, source_freshness) in zip(sources, outcomes):
+        results[source] = result
+        timings[source] = elapsed
+        freshness[source] = source_freshness
+    return results, timings, freshness
+
+def collect_sources(sources: Dict[str, DataCollector], concurrent: bool = True, max_workers: int = 4, deadline: float = 120, fallback_store: Optional[LastKnownGoodStore] = None, source_deadlines: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, Dict[str, Any]]]:
+    """
+    Collect data from all sources on one event loop
+    
+    Blocking HTTP calls issued by the collectors share one bounded worker pool.
+    The pool is not waited on at the end. Calls still running for a source
+    that blew its deadline stop at their next HTTP request (see cancel_scope),
+    but a request already in flight runs until it returns or hits the HTTP
+    timeout, and the interpreter waits for it before exiting.
+    
+    Args:
+        sources: Mapping of source name to collector
+        concurrent: Whether to run the collections in parallel
+        max_workers: Upper bound on concurrent blocking calls
+        deadline: Seconds each source may take
+        fallback_store: Store of last successful outputs, or None to disable fallback
+        source_deadlines: Optional per-source overrides of the deadline
+        
+    Returns:
+        Tuple of (results, wall time in seconds, freshness info), each keyed by source
+    """
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='collector')
+    loop.set_default_executor(executor)
+    try:
+        return loop.run_until_complete(acollect_sources(sources, concurrent, deadline, fallback_store, source_deadlines))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        loop.close()
+
+def collect_and_process_data(concurrent: Optional[bool] = None) -> Dict[str, Any]:
     """
     Main function to collect and process all data
     
+    Args:
+        concurrent: Collect sources in parallel; defaults to the pipeline config
+    
     Returns:
         Dict[str, Any]: Processed metrics ready for dashboard
     """
     try:
+        pipeline_config = Config.get_pipeline_config()
+        if concurrent is None:
+            concurrent = pipeline_config['concurrent_collection']
+        
         # Initialize collectors
-        fb_collector, luma_collector, divvy_collector, calculator, _ = initialize_collectors()
+        fb_collector, luma_collector, divvy_collector, bucketlister_collector, calculator, _ = initialize_collectors()
         
-        # Collect Facebook Ads data
-        logger.info("Collecting Facebook Ads data...")
-        fb_data = fb_collector.collect()
-        logger.info("Successfully collected Facebook Ads data")
+        sources = {
+            'facebook': fb_collector,
+            'luma': luma_collector,
+            'bucketlister': bucketlister_collector,
+            'divvy': divvy_collector
+        }
         
-        # Collect Luma data
-        logger.info("Collecting Luma data...")
-        luma_data = luma_collector.collect()
-        logger.info("Successfully collected Luma data")
+        logger.info(f"Collecting data from {len(sources)} sources ({'concurrent' if concurrent else 'sequential'})...")
+        start = time.monotonic()
+        results, timings, freshness = collect_sources(
+            sources,
+            concurrent,
+            pipeline_config['max_workers'],
+            pipeline_config['source_deadline'],
+            LastKnownGoodStore(),
+            pipeline_config['source_deadlines']
+        )
+        total_elapsed = time.monotonic() - start
         
-        # Get Bucketlister tickets sold
-        logger.info("Getting Bucketlister tickets data...")
-        bucketlister_tickets = bucketlister_daily()
-        logger.info(f"Successfully got Bucketlister tickets: {bucketlister_tickets}")
+        for source, elapsed in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+            logger.info(f"{source} collection time: {elapsed:.2f}s")
+        logger.info(f"Total collection wall time: {total_elapsed:.2f}s")
         
-        # Collect Divvy data
-        logger.info("Collecting Divvy data...")
-        divvy_data = divvy_collector.collect()
-        logger.info("Successfully collected Divvy data")
+        stale_sources = [source for source, info in freshness.items() if info['stale']]
+        if stale_sources:
+            logger.warning(f"Using stale data for: {', '.join(stale_sources)}")
+        logger.info(f"Bucketlister tickets: {results['bucketlister']}")
         
         # Calculate combined metrics
         logger.info("Calculating combined metrics...")
-        metrics = calculator.calculate_metrics(fb_data, luma_data, bucketlister_tickets, divvy_data)
+        metrics = calculator.calculate_metrics(
+            results['facebook'],
+            results['luma'],
+            results['bucketlister'],
+            results['divvy'],
+            bucketlister_collector.daily_by_experience
+        )
+        metrics['collection_timings'] = {
+            **{source: round(elapsed, 3) for source, elapsed in timings.items()},
+            'total': round(total_elapsed, 3)
+        }
+        metrics['data_freshness'] = freshness
         logger.info("Successfully calculated combined metrics")
         
+        # Keep the latest snapshot for the API server's read endpoint
+        save_latest_metrics(metrics)
+        
         return metrics
         
     except Exception as e:
@@ -149,7 +302,14 @@ def push_to_dashboard(metrics: Dict[str, Any]) -> None:
                     "accumulatedGuests": day['accumulatedGuests']
                 }
                 for day in metrics['dailyMetrics']
-            ]
+            ],
+            "dataFreshness": {
+                source: {
+                    "stale": info['stale'],
+                    "collectedAt": info['collected_at']
+                }
+                for source, info in metrics.get('data_freshness', {}).items()
+            }
         }
         
         # Log the metrics being sent for debugging
@@ -224,8 +384,46 @@ def log_metrics_summary(metrics: Dict[str, Any]):
     except Exception as e:
         logger.error(f"Error logging metrics summary: {str(e)}")
 
+def summarize_run(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summary of a completed refresh, recorded for jobs that waited on it
+    
+    Args:
+        metrics: Output of collect_and_process_data
+        
+    Returns:
+        Dict with the timestamp, metrics, collection timings and data freshness
+    """
+    return {
+        'timestamp': metrics['timestamp'],
+        'metrics': metrics['metrics'],
+        'collection_timings': metrics.get('collection_timings', {}),
+        'data_freshness': metrics.get('data_freshness', {})
+    }
+
 def main():
-    """Main entry point"""
+    """
+    Main entry point
+    
+    Runs under the cross-process refresh lock, so a cron run never overlaps a
+    refresh started from the API server. If another refresh completes while
+    this one waits for the lock, its result is used instead of running again.
+    """
+    refresh_lock = RunLock('refresh')
+    with refresh_lock.hold() as completed:
+        if completed:
+            logger.info(f"A dashboard refresh finished at {completed['finished_at']} while waiting, skipping this run")
+            return 0
+        
+        return run_pipeline(refresh_lock)
+
+def run_pipeline(run_lock: Optional[RunLock] = None):
+    """
+    Collect, calculate and push the dashboard metrics
+    
+    Args:
+        run_lock: Held lock to record the run's summary in once it has been pushed
+    """
     try:
         logger.info("Starting Maayan Dashboard data pipeline")
         logger.info(f"Time: {datetime.utcnow().isoformat()}Z")
@@ -280,6 +478,8 @@ def main():
         
         # Push to Dashboard
         push_to_dashboard(metrics)
+        if run_lock:
+            run_lock.record(summarize_run(metrics))
         
         # TODO: Add health check
         # TODO: Add alerting
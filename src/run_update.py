@@ -11,11 +11,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     # Import the bucketlister module to test if the key is valid
-    from src.collectors.bucketlister import get_bucketlister_data
+    from src.collectors.bucketlister import get_bucketlister_data, sync_window
     
     try:
-        # Test if the key is valid by making a request
-        data = get_bucketlister_data()
+        # Test if the key is valid by making a request; the response is cached,
+        # so the collection run below reuses it instead of fetching again
+        data = get_bucketlister_data(*sync_window())
         
         if not data or 'error' in data:
             print("KEY_ERROR: Invalid or expired Bucketlister session key", file=sys.stderr)
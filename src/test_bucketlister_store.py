@@ -0,0 +1,52 @@
+"""
+Test script for the Bucketlister interval store
+"""
+
+import tempfile
+from datetime import date
+
+from src.collectors.bucketlister_store import BucketlisterIntervalStore
+from src.utils.logger import setup_logger
+
+logger = setup_logger('test_bucketlister_store')
+
+def _document(tickets_by_day):
+    """Build an insights document with one experience selling every ticket"""
+    summaries = [
+        {'intervalStart': f"{day}T00:00:00Z", 'ticketsSold': tickets}
+        for day, tickets in tickets_by_day.items()
+    ]
+    return {'salesByExperience': {
+        'intervalSummaries': summaries,
+        'experiences': [{'name': 'Sunset Sail', 'intervalSummaries': summaries}]
+    }}
+
+def test_full_document_in_windowed_sync():
+    """A server that ignores the date range must not inflate days outside the window"""
+    try:
+        history = {'2025-03-01': 5, '2025-03-09': 2, '2025-03-10': 3}
+        today = date(2025, 3, 10)
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            store_file = BucketlisterIntervalStore(state_dir)
+            store = store_file.load()
+            BucketlisterIntervalStore.merge(store, _document(history), None, today)
+
+            for _ in range(3):
+                start, end = BucketlisterIntervalStore.sync_window(store, today, window_days=2)
+                assert start == date(2025, 3, 8), f"Unexpected sync window start {start}"
+                BucketlisterIntervalStore.merge(store, _document(history), start, end)
+                store_file.save(store)
+                store = store_file.load()
+
+            assert BucketlisterIntervalStore.daily_tickets(store) == history, "Windowed syncs changed the stored days"
+            assert BucketlisterIntervalStore.daily_by_experience(store) == {'Sunset Sail': history}, "Experience series changed"
+
+        logger.info("Three windowed syncs of the full document kept every day's tickets")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    test_full_document_in_windowed_sync()
@@ -0,0 +1,97 @@
+"""
+Test script for the Divvy transaction ledger
+"""
+
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from src.collectors.divvy_aggregator import SpendAggregator
+from src.collectors.divvy_ledger import DivvyLedger, format_time, normalize_time
+from src.utils.logger import setup_logger
+
+logger = setup_logger('test_divvy_ledger')
+
+def _transaction(uuid, occurred, amount, transaction_type, original=None):
+    return {
+        'uuid': uuid,
+        'occurredTime': occurred.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'),
+        'transactionType': transaction_type,
+        'originalAuthTransactionUuid': original,
+        'amount': amount,
+        'merchantName': 'Coffee Shop',
+        'merchantCategoryCode': '5814'
+    }
+
+def test_ledger_matches_final_listing():
+    """Cleared and voided authorizations must not stay in the ledger"""
+    try:
+        now = datetime(2025, 3, 15, 20, 0, tzinfo=timezone.utc)
+        window = (now - timedelta(days=7), now)
+        auth = _transaction('txr_auth', now - timedelta(hours=5), 25.61, 'AUTHORIZATION')
+        voided = _transaction('txr_void', now - timedelta(hours=4), 16.32, 'AUTHORIZATION')
+        clear = _transaction('txr_clear', now - timedelta(hours=1), 25.61, 'CLEAR', original='txr_auth')
+
+        # The API drops a cleared authorization and a voided one from its listing
+        first_listing = [voided, auth]
+        final_listing = [clear]
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            ledger = DivvyLedger(Path(state_dir) / 'ledger.sqlite3')
+            ledger.upsert(first_listing, window)
+            ledger.upsert(final_listing, window)
+            summary = ledger.summary(*window)
+
+        aggregator = SpendAggregator()
+        aggregator.add_all(final_listing)
+        expected = aggregator.summary()
+
+        assert summary['total_spend'] == expected['total_spend'], f"Ledger total {summary['total_spend']} != {expected['total_spend']}"
+        assert summary['transaction_count'] == expected['transaction_count'], "Ledger transaction count differs"
+        assert summary['daily_spend'] == expected['daily_spend'], "Ledger daily spend differs"
+
+        logger.info(f"Ledger matches the final listing: ${summary['total_spend']:.2f} in {summary['transaction_count']} transaction")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_clear_replaces_authorization_outside_window():
+    """A clear removes its authorization even when no window is given"""
+    try:
+        now = datetime(2025, 3, 15, 20, 0, tzinfo=timezone.utc)
+        auth = _transaction('txr_auth', now - timedelta(days=2), 40.0, 'AUTHORIZATION')
+        clear = _transaction('txr_clear', now, 40.0, 'CLEAR', original='txr_auth')
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            ledger = DivvyLedger(Path(state_dir) / 'ledger.sqlite3')
+            ledger.upsert([auth])
+            ledger.upsert([clear])
+            summary = ledger.summary(now - timedelta(days=7), now)
+
+        assert summary['total_spend'] == 40.0 and summary['transaction_count'] == 1, f"Clear counted twice: {summary}"
+
+        logger.info("Clear replaced its authorization")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_normalize_time_matches_parsing():
+    """String normalization must agree with parsing for every offset form"""
+    try:
+        for value in ['2025-03-15T20:46:31.000+00:00', '2025-03-15T20:46:31Z', '2025-03-15T20:46:31.123456Z',
+                      '2025-03-15T22:46:31.5+02:00', '2025-03-15T20:46:31']:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            assert normalize_time(value) == format_time(parsed), f"Normalized {value} differs from parsing"
+
+        logger.info("Normalized timestamps match parsed ones")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    test_ledger_matches_final_listing()
+    test_clear_replaces_authorization_outside_window()
+    test_normalize_time_matches_parsing()
@@ -0,0 +1,86 @@
+"""
+Test script for Graph API batch splitting
+"""
+
+import requests
+
+from src.collectors.facebook_batch import GraphBatcher
+from src.utils.logger import setup_logger
+
+logger = setup_logger('test_facebook_batch')
+
+def _http_error(status_code: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+class FlakyBatch:
+    """Batch endpoint that fails every batch larger than max_size"""
+
+    def __init__(self, max_size: int, error: Exception):
+        self.max_size = max_size
+        self.error = error
+        self.calls = []
+
+    def __call__(self, relative_urls):
+        self.calls.append(len(relative_urls))
+        if len(relative_urls) > self.max_size:
+            raise self.error
+        return [{'code': 200, 'headers': [], 'body': url} for url in relative_urls]
+
+def test_split_resolves_every_request():
+    """A batch that times out is split until every request gets its own result"""
+    try:
+        send_batch = FlakyBatch(1, requests.exceptions.Timeout("batch timed out"))
+        batcher = GraphBatcher(send_batch, window=60, max_batch_size=8)
+        futures = [batcher.submit(f"act_1/ads?page={i}") for i in range(8)]
+
+        results = [future.result(timeout=5)['body'] for future in futures]
+        assert results == [f"act_1/ads?page={i}" for i in range(8)], "Split batch returned wrong items"
+        assert sorted(send_batch.calls) == sorted([8, 4, 4, 2, 2, 2, 2] + [1] * 8), f"Unexpected batch sizes {send_batch.calls}"
+        assert batcher.max_batch_size == 1, "Batch size was not reduced"
+
+        logger.info(f"Split batch of 8 into {len(send_batch.calls)} sends, all requests resolved")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_client_error_is_not_split():
+    """A 401 fails every request of the batch in one call and keeps the batch size"""
+    try:
+        send_batch = FlakyBatch(0, _http_error(401))
+        batcher = GraphBatcher(send_batch, window=60, max_batch_size=4)
+        futures = [batcher.submit(f"act_1/insights?page={i}") for i in range(4)]
+
+        for future in futures:
+            assert isinstance(future.exception(timeout=5), requests.exceptions.HTTPError), "Request did not fail"
+        assert send_batch.calls == [4], f"Batch was split on a client error: {send_batch.calls}"
+        assert batcher.max_batch_size == 4, "Batch size changed on a client error"
+
+        logger.info("Client error failed the batch without splitting it")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_server_error_is_split():
+    """A 5xx response splits the batch like a timeout"""
+    try:
+        send_batch = FlakyBatch(2, _http_error(503))
+        batcher = GraphBatcher(send_batch, window=60, max_batch_size=4)
+        futures = [batcher.submit(f"act_1/ads?page={i}") for i in range(4)]
+
+        assert all(future.result(timeout=5)['code'] == 200 for future in futures), "Split batch failed"
+        assert send_batch.calls == [4, 2, 2], f"Unexpected batch sizes {send_batch.calls}"
+
+        logger.info("Server error split the batch in two")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    test_split_resolves_every_request()
+    test_client_error_is_not_split()
+    test_server_error_is_split()
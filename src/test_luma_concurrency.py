@@ -0,0 +1,190 @@
+"""
+Test script for parallel Luma guest fetching
+"""
+
+import copy
+import os
+import random
+import tempfile
+import time
+
+for var in ['YADIN_FACEBOOK_ADS_TOKEN', 'LUMA_API_KEY', 'VERCEL_API_URL', 'API_KEY', 'DIVVY_API_TOKEN']:
+    os.environ.setdefault(var, 'test')
+
+from src.collectors.luma_collector import LumaCollector
+from src.collectors.luma_store import LumaEventStore
+from src.utils.cache import ResponseCache
+from src.utils.http import RequestPacer
+from src.utils.logger import setup_logger
+
+logger = setup_logger('test_luma_concurrency')
+
+def _make_events(event_count: int):
+    """Build calendar events with overlapping guests across events"""
+    rng = random.Random(42)
+    events = {}
+    for i in range(event_count):
+        event_id = f"evt-test{i:03d}"
+        entries = []
+        for j in range(rng.randint(1, 8)):
+            email = f"guest{rng.randint(0, 15)}@example.com"
+            tickets = [{"amount": rng.choice([0, 1500, 2500, 4000])} for _ in range(rng.randint(1, 3))]
+            entries.append({"guest": {
+                "api_id": f"gst-{i}-{j}",
+                "email": email,
+                "registered_at": f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T12:00:00Z",
+                "event_tickets": tickets
+            }})
+        events[event_id] = entries
+    return events
+
+class FixtureLumaCollector(LumaCollector):
+    """Luma collector answering from fixtures with random latency"""
+
+    def __init__(self, events, max_concurrent_events: int, state_dir: str, incremental: bool = False, end_at: str = "2099-01-01T00:00:00Z"):
+        super().__init__()
+        self.events = events
+        self.end_at = end_at
+        self.max_concurrent_events = max_concurrent_events
+        self.incremental = incremental
+        self.guest_requests = 0
+        self.pacer = RequestPacer(0)
+        self.cache = ResponseCache(directory=state_dir, ttls={})
+        self.event_store = LumaEventStore(directory=state_dir)
+        self.rng = random.Random(max_concurrent_events)
+
+    def _make_request(self, endpoint, params=None):
+        time.sleep(self.rng.uniform(0, 0.02))
+        if endpoint == "calendar/list-events":
+            return {"entries": [
+                {"event": {"api_id": event_id, "name": event_id, "end_at": self.end_at}}
+                for event_id in self.events
+            ]}
+        self.guest_requests += 1
+        entries = self.events[params["event_api_id"]]
+        if params.get("sort_direction") == "desc":
+            entries = sorted(entries, key=lambda entry: entry["guest"]["registered_at"], reverse=True)
+        return {"entries": entries}
+
+def _run(events, state_dir: str, max_concurrent_events: int = 4, **options):
+    collector = FixtureLumaCollector(events, max_concurrent_events, state_dir, **options)
+    data = collector.collect()
+    data.pop("timestamp")
+    return data, collector.guest_history, collector.guest_requests
+
+def _collect(events, max_concurrent_events: int):
+    with tempfile.TemporaryDirectory() as state_dir:
+        data, history, _ = _run(events, state_dir, max_concurrent_events)
+        return data, history
+
+def _change_registrations(events):
+    """Refund each event's latest paid registration and add a newer one"""
+    changed = copy.deepcopy(events)
+    for event_id, entries in changed.items():
+        paid = [entry for entry in entries if any(ticket["amount"] for ticket in entry["guest"]["event_tickets"])]
+        if paid:
+            latest = max(paid, key=lambda entry: entry["guest"]["registered_at"])
+            latest["guest"]["event_tickets"] = []
+        entries.append({"guest": {
+            "api_id": f"gst-{event_id}-new",
+            "email": "late@example.com",
+            "registered_at": "2025-12-31T12:00:00Z",
+            "event_tickets": [{"amount": 2500}]
+        }})
+    return changed
+
+def test_parallel_matches_serial():
+    """Parallel fetching must produce exactly the serial results"""
+    try:
+        events = _make_events(24)
+
+        serial_data, serial_history = _collect(events, max_concurrent_events=1)
+        parallel_data, parallel_history = _collect(events, max_concurrent_events=8)
+
+        assert serial_data == parallel_data, "Daily sales differ between serial and parallel fetching"
+        assert serial_history == parallel_history, "Guest history differs between serial and parallel fetching"
+        assert list(serial_history) == list(parallel_history), "Guest history order differs"
+
+        logger.info(f"Serial and parallel results match: {serial_data['total_guests']} guests, "
+                    f"${serial_data['total_revenue']/100:.2f} revenue")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_incremental_matches_full():
+    """Incremental syncs, including refunds, must match a full fetch"""
+    try:
+        events = _make_events(12)
+        changed = _change_registrations(events)
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            _run(events, state_dir, incremental=True)
+            incremental_data, incremental_history, _ = _run(changed, state_dir, incremental=True)
+
+        full_data, full_history = _collect(changed, max_concurrent_events=4)
+
+        assert incremental_data == full_data, "Incremental and full fetches disagree"
+        assert incremental_history == full_history, "Guest history differs between incremental and full fetches"
+
+        logger.info(f"Incremental sync matches full fetch: ${full_data['total_revenue']/100:.2f} revenue")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_finished_events_are_frozen():
+    """Finished events are fetched once, then served from the store"""
+    try:
+        events = _make_events(6)
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            first_data, first_history, first_requests = _run(events, state_dir, incremental=True, end_at="2025-01-01T00:00:00Z")
+            # Later changes to a frozen event are no longer fetched
+            second_data, second_history, second_requests = _run(
+                _change_registrations(events), state_dir, incremental=True, end_at="2025-01-01T00:00:00Z"
+            )
+
+        assert first_requests == len(events), f"Expected one guest fetch per event, got {first_requests}"
+        assert second_requests == 0, f"Frozen events were fetched again ({second_requests} requests)"
+        assert first_data == second_data and first_history == second_history, "Frozen aggregates changed"
+        assert first_data == _collect(events, max_concurrent_events=4)[0], "Frozen aggregates differ from a full fetch"
+
+        logger.info("Finished events were frozen after one fetch")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+def test_freeze_sees_old_refunds():
+    """The fetch before freezing must catch refunds older than the lookback window"""
+    try:
+        events = _make_events(8)
+
+        # Refund each event's oldest paid registration, far outside the lookback
+        refunded = copy.deepcopy(events)
+        for entries in refunded.values():
+            paid = [entry for entry in entries if any(ticket["amount"] for ticket in entry["guest"]["event_tickets"])]
+            if paid:
+                min(paid, key=lambda entry: entry["guest"]["registered_at"])["guest"]["event_tickets"] = []
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            _run(events, state_dir, incremental=True)
+            frozen_data, frozen_history, _ = _run(refunded, state_dir, incremental=True, end_at="2025-01-01T00:00:00Z")
+
+        full_data, full_history = _collect(refunded, max_concurrent_events=4)
+
+        assert frozen_data == full_data, "Frozen aggregates kept a refunded registration"
+        assert frozen_history == full_history, "Frozen guest history kept a refunded registration"
+
+        logger.info(f"Frozen aggregates match a full fetch: ${full_data['total_revenue']/100:.2f} revenue")
+
+    except Exception as e:
+        logger.error(f"Test failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    test_parallel_matches_serial()
+    test_incremental_matches_full()
+    test_finished_events_are_frozen()
+    test_freeze_sees_old_refunds()
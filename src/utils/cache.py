@@ -0,0 +1,197 @@
+"""
+On-disk snapshot cache for raw API responses
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import Config
+from src.utils.logger import setup_logger
+from src.utils.state import atomic_write_bytes, get_state_dir, load_json, save_json
+
+logger = setup_logger('response_cache')
+
+class ResponseCache:
+    """
+    Stores raw JSON responses compressed on disk, keyed by source, endpoint and params
+
+    Entries past their TTL are kept for the retention period so they can be
+    revalidated, and are then deleted. Each source's directory is pruned on
+    put, at most once per PRUNE_INTERVAL seconds per process.
+    """
+
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, directory: Optional[Path] = None, ttls: Optional[Dict[str, float]] = None, retention: Optional[float] = None):
+        config = Config.get_cache_config()
+        self.directory = Path(directory) if directory else get_state_dir('response_cache')
+        self.ttls = ttls if ttls is not None else config['ttl']
+        self.retention = retention if retention is not None else config['retention']
+        self.enabled = config['enabled']
+        self._pruned_at: Dict[str, float] = {}
+        self._prune_lock = threading.Lock()
+
+    def ttl(self, source: str) -> float:
+        """Get the time-to-live in seconds for a source"""
+        return self.ttls.get(source, 0)
+
+    def _path(self, source: str, endpoint: str, params: Optional[Dict[str, Any]]) -> Path:
+        key = json.dumps([endpoint, params or {}], sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.directory / source / f"{digest}.json.gz"
+
+    def get(self, source: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Get a cached response if it is younger than the source's TTL
+
+        Args:
+            source: Source name (facebook, luma, divvy, bucketlister)
+            endpoint: Endpoint or URL the response came from
+            params: Request params, excluding credentials
+
+        Returns:
+            The cached JSON document, or None on a miss
+        """
+        ttl = self.ttl(source)
+        if not self.enabled or ttl <= 0:
+            return None
+
+        path = self._path(source, endpoint, params)
+        try:
+            if time.time() - path.stat().st_mtime > ttl:
+                return None
+        except FileNotFoundError:
+            return None
+
+        data = self._read(path)
+        if data is not None:
+            logger.info(f"Cache hit for {source} {endpoint}")
+        return data
+
+    def _read(self, path: Path) -> Any:
+        try:
+            with gzip.open(path, 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {str(e)}")
+            return None
+
+    def get_stale(self, source: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, Dict[str, str]]:
+        """
+        Get a cached response regardless of its age, for conditional revalidation
+
+        Args:
+            source: Source name
+            endpoint: Endpoint or URL the response came from
+            params: Request params, excluding credentials
+
+        Returns:
+            Tuple of the cached JSON document (or None) and the validators
+            stored with it ('etag' and/or 'last_modified', possibly empty)
+        """
+        if not self.enabled or self.ttl(source) <= 0:
+            return None, {}
+
+        path = self._path(source, endpoint, params)
+        data = self._read(path)
+        if data is None:
+            return None, {}
+        return data, load_json(path.with_suffix('.validators')) or {}
+
+    def touch(self, source: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """Mark a cached response as fresh again (after a 304 Not Modified)"""
+        path = self._path(source, endpoint, params)
+        try:
+            os.utime(path)
+            # Keep the validators as long as the entry they belong to
+            if path.with_suffix('.validators').exists():
+                os.utime(path.with_suffix('.validators'))
+        except OSError as e:
+            logger.warning(f"Could not refresh cache entry for {source} {endpoint}: {str(e)}")
+
+    def put(self, source: str, endpoint: str, params: Optional[Dict[str, Any]], data: Any, validators: Optional[Dict[str, str]] = None) -> None:
+        """
+        Store a response
+
+        Args:
+            source: Source name
+            endpoint: Endpoint or URL the response came from
+            params: Request params, excluding credentials
+            data: Decoded JSON response
+            validators: Optional ETag/Last-Modified values for revalidation
+        """
+        if not self.enabled or self.ttl(source) <= 0:
+            return
+
+        path = self._path(source, endpoint, params)
+        try:
+            atomic_write_bytes(path, gzip.compress(json.dumps(data).encode('utf-8')))
+            if validators:
+                save_json(path.with_suffix('.validators'), validators)
+            else:
+                path.with_suffix('.validators').unlink(missing_ok=True)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not cache {source} {endpoint}: {str(e)}")
+
+        self._maybe_prune(source)
+
+    def _maybe_prune(self, source: str) -> None:
+        now = time.time()
+        with self._prune_lock:
+            if now - self._pruned_at.get(source, 0) < self.PRUNE_INTERVAL:
+                return
+            self._pruned_at[source] = now
+        self.prune(source)
+
+    def prune(self, source: str) -> int:
+        """
+        Delete a source's entries untouched for longer than its TTL and the retention period
+
+        Args:
+            source: Source name
+
+        Returns:
+            int: Number of files deleted
+        """
+        cutoff = time.time() - max(self.ttl(source), self.retention)
+        removed = 0
+        try:
+            paths = list((self.directory / source).iterdir())
+        except FileNotFoundError:
+            return 0
+
+        for path in paths:
+            if not path.name.endswith(('.json.gz', '.validators')):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Could not prune cache entry {path}: {str(e)}")
+
+        if removed:
+            logger.info(f"Pruned {removed} expired {source} cache files")
+        return removed
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
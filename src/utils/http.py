@@ -0,0 +1,157 @@
+"""
+Shared HTTP client and event loop helpers for collectors
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import Config
+
+T = TypeVar('T')
+
+_session = None
+_session_lock = threading.Lock()
+
+# Cancel flag of the collection the current call works for (see cancel_scope)
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar('cancel_event', default=None)
+
+class CollectionCancelled(BaseException):
+    """
+    Raised in a worker thread whose collection was abandoned
+
+    Like asyncio.CancelledError it derives from BaseException, so retry
+    decorators and broad except clauses in the collectors let it through.
+    """
+
+@contextmanager
+def cancel_scope() -> Iterator[threading.Event]:
+    """
+    Give the blocking calls started inside the block a shared cancel flag
+
+    Once the flag is set, every HTTP request those calls make through the
+    shared session raises CollectionCancelled, so abandoned work stops at
+    its next page instead of running on in the background.
+
+    Yields:
+        threading.Event: Flag to set when the collection is abandoned
+    """
+    event = threading.Event()
+    token = _cancel_event.set(event)
+    try:
+        yield event
+    finally:
+        _cancel_event.reset(token)
+
+def raise_if_cancelled() -> None:
+    """Raise CollectionCancelled if the current collection was abandoned"""
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise CollectionCancelled("Collection was abandoned")
+
+class _TimeoutSession(requests.Session):
+    """Session that applies a default timeout to every request"""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args: Any, **kwargs: Any) -> requests.Response:
+        raise_if_cancelled()
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(*args, **kwargs)
+
+def get_session() -> requests.Session:
+    """
+    Get the process-wide HTTP session shared by all collectors
+
+    The session keeps a connection pool per host so repeated calls to the same
+    API reuse TLS connections instead of opening a new one per request.
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pipeline_config = Config.get_pipeline_config()
+                pool_size = max(10, pipeline_config['max_workers'])
+                session = _TimeoutSession(pipeline_config['http_timeout'])
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+class RequestPacer:
+    """
+    Spaces out request starts to stay under an API's rate limit
+
+    Shared by all worker threads of a collector. When the API answers with a
+    rate-limit response, pause() pushes every following request back.
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+
+    def wait(self) -> None:
+        """Block until the next request may start"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed)
+            self._next_allowed = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests for the given number of seconds"""
+        with self._lock:
+            self._next_allowed = max(self._next_allowed, time.monotonic() + seconds)
+
+def retry_after_seconds(response: requests.Response, default: float = 5.0) -> float:
+    """Read the Retry-After header of a rate-limited response"""
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except (TypeError, ValueError):
+        return default
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call on the event loop's worker pool
+
+    The call runs in a copy of the caller's context, so it sees the cancel
+    flag of the collection that started it.
+
+    Args:
+        func: Blocking callable, usually a collector's request method
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, func, *args, **kwargs))
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    return asyncio.run(coro)
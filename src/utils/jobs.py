@@ -0,0 +1,126 @@
+"""
+In-process background jobs for the API server
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.logger import setup_logger
+from src.utils.state import RunLock
+
+logger = setup_logger('jobs')
+
+# A job is a list of named stages run in order; the last stage's return value is the result
+Stage = Tuple[str, Callable[[], Any]]
+
+class JobRunner:
+    """
+    Runs jobs on a background worker and keeps their status for polling
+
+    Jobs run one at a time in submission order. Each job record reports its
+    status (queued, running, succeeded, failed), the current stage, the time
+    spent in every finished stage and the result or error.
+
+    Jobs submitted with the same coalesce key are single-flight: while one
+    is running, the first new request queues one follow-up job and every
+    later request attaches to that follow-up instead of adding another.
+    """
+
+    def __init__(self, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job')
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, stages: List[Stage], coalesce_key: Optional[str] = None, run_lock: Optional[RunLock] = None) -> str:
+        """
+        Queue a job, or attach to an equivalent job that has not started yet
+
+        Args:
+            name: Job name shown in its status
+            stages: (stage name, callable) pairs run in order
+            coalesce_key: Jobs sharing this key are coalesced while queued
+            run_lock: Optional cross-process lock held around the stages
+
+        Returns:
+            str: Id of the new job or of the queued job it attached to
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if coalesce_key is not None:
+                for job in self._jobs.values():
+                    if job['coalesce_key'] == coalesce_key and job['status'] == 'queued':
+                        job['attached'] += 1
+                        logger.info(f"Attached {name} request to queued job {job['id']}")
+                        return job['id']
+
+            self._jobs[job_id] = {
+                'id': job_id,
+                'name': name,
+                'status': 'queued',
+                'stage': None,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'timings': {},
+                'result': None,
+                'error': None,
+                'coalesce_key': coalesce_key,
+                'attached': 0
+            }
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job_id, stages, run_lock)
+        logger.info(f"Queued job {name} ({job_id})")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of a job's status, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {**job, 'timings': dict(job['timings'])} if job else None
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, stages: List[Stage], run_lock: Optional[RunLock]) -> None:
+        self._update(job_id, status='running', started_at=datetime.now(timezone.utc).isoformat())
+        timings = {}
+        result = None
+        stage = None
+        try:
+            with run_lock.hold() if run_lock else nullcontext() as completed:
+                if completed:
+                    logger.info(f"Job {job_id} reuses the run that finished at {completed['finished_at']}")
+                    result = completed['result']
+                else:
+                    for stage, func in stages:
+                        self._update(job_id, stage=stage)
+                        start = time.monotonic()
+                        try:
+                            result = func()
+                        finally:
+                            timings[stage] = round(time.monotonic() - start, 3)
+                            self._update(job_id, timings=dict(timings))
+                    if run_lock:
+                        run_lock.record(result)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed in stage {stage}: {str(e)}")
+            self._update(
+                job_id,
+                status='failed',
+                error={'code': getattr(e, 'code', 'JOB_FAILED'), 'message': str(e)},
+                finished_at=datetime.now(timezone.utc).isoformat()
+            )
+            return
+
+        self._update(job_id, status='succeeded', result=result, finished_at=datetime.now(timezone.utc).isoformat())
+        logger.info(f"Job {job_id} succeeded in {sum(timings.values()):.2f}s")
@@ -0,0 +1,27 @@
+"""
+Field projection for collector outputs
+"""
+
+from typing import Any
+
+def project(data: Any, mask: Any) -> Any:
+    """
+    Keep only the fields named by a mask
+
+    A mask is True (keep the value as-is), a dict mapping field names to
+    masks for their values, or a one-item list holding the mask applied to
+    every item of a list. Fields named in the mask but missing from the data
+    are skipped.
+
+    Args:
+        data: Value to project
+        mask: Mask describing the fields to keep
+
+    Returns:
+        Any: Projected copy of the data (kept values are not copied)
+    """
+    if mask is True or data is None:
+        return data
+    if isinstance(mask, list):
+        return [project(item, mask[0]) for item in data]
+    return {field: project(data[field], field_mask) for field, field_mask in mask.items() if field in data}
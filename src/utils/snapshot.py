@@ -0,0 +1,75 @@
+"""
+Latest computed metrics snapshot, shared between the pipeline and the API server
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.utils.logger import setup_logger
+from src.utils.state import atomic_write_bytes, get_state_dir
+
+logger = setup_logger('snapshot')
+
+def _default_path() -> Path:
+    return get_state_dir() / 'latest_metrics.json'
+
+def save_latest_metrics(metrics: Dict[str, Any], path: Optional[Path] = None) -> None:
+    """
+    Store the metrics of a completed pipeline run for the read endpoint
+
+    Args:
+        metrics: Output of collect_and_process_data
+        path: Optional snapshot file (defaults to state/latest_metrics.json)
+    """
+    try:
+        atomic_write_bytes(path or _default_path(), json.dumps(metrics, sort_keys=True, default=str).encode('utf-8'))
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not store latest metrics snapshot: {str(e)}")
+
+class LatestMetrics:
+    """
+    Serves the latest metrics snapshot from memory
+
+    The encoded body, its gzip variant and their strong ETags are computed
+    once per snapshot. The file is only re-read after a run has replaced it,
+    so polling costs a stat call.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else _default_path()
+        self._version = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the current snapshot
+
+        Returns:
+            Dict with 'body' and 'gzip_body' (bytes) and 'etag' and
+            'gzip_etag' (quoted strong ETags), or None if no run has completed
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+
+        with self._lock:
+            if version != self._version:
+                with open(self.path, 'rb') as f:
+                    body = f.read()
+                digest = hashlib.sha256(body).hexdigest()
+                self._snapshot = {
+                    'body': body,
+                    'gzip_body': gzip.compress(body, mtime=0),
+                    'etag': f'"{digest}"',
+                    'gzip_etag': f'"{digest}-gzip"'
+                }
+                self._version = version
+            return self._snapshot
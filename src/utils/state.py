@@ -0,0 +1,159 @@
+"""
+Local state persistence for the data pipeline
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from src.config import Config
+from src.utils.logger import setup_logger
+
+logger = setup_logger('state')
+
+def get_state_dir(*parts: str) -> Path:
+    """
+    Get (and create) a directory under the pipeline state directory
+
+    Args:
+        *parts: Optional sub-directory components
+
+    Returns:
+        Path: Existing directory path
+    """
+    path = Path(Config.STATE_DIR).joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def atomic_write_bytes(path: Path, content: bytes) -> None:
+    """
+    Write a file so readers never observe a partially written version
+
+    The content goes to a temporary file in the same directory which is then
+    renamed over the destination.
+
+    Args:
+        path: Destination file
+        content: Bytes to write
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def save_json(path: Path, data: Any) -> None:
+    """Atomically write data as JSON"""
+    atomic_write_bytes(path, json.dumps(data, default=str).encode('utf-8'))
+
+def load_json(path: Path, default: Any = None) -> Any:
+    """
+    Read a JSON file written by save_json
+
+    Args:
+        path: File to read
+        default: Value returned when the file is missing or unreadable
+
+    Returns:
+        Parsed JSON content or default
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read state file {path}: {str(e)}")
+        return default
+
+class LastKnownGoodStore:
+    """Keeps the last successful output of each collector"""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else get_state_dir('last_known_good')
+
+    def _path(self, source: str) -> Path:
+        return self.directory / f"{source}.json"
+
+    def save(self, source: str, data: Any) -> None:
+        """
+        Store a collector's successful output
+
+        Args:
+            source: Source name
+            data: Collector output
+        """
+        save_json(self._path(source), {
+            'collected_at': datetime.now(timezone.utc).isoformat(),
+            'data': data
+        })
+
+    def load(self, source: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the last successful output of a collector
+
+        Args:
+            source: Source name
+
+        Returns:
+            Dict with 'data' and 'collected_at', or None if nothing was stored
+        """
+        return load_json(self._path(source))
+
+
+class RunLock:
+    """
+    Cross-process lock that lets only one dashboard refresh run at a time
+
+    Runs in other processes (cron, the API server) wait on an flock. A
+    waiter whose request is older than the last completed run gets that run
+    back instead of starting another one.
+    """
+
+    def __init__(self, name: str, directory: Optional[Path] = None):
+        directory = Path(directory) if directory else get_state_dir('locks')
+        self.lock_path = directory / f"{name}.lock"
+        self.status_path = directory / f"{name}.json"
+
+    @contextmanager
+    def hold(self) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Hold the lock for the duration of a run
+
+        Yields:
+            The status record of a run that completed while this caller was
+            waiting (the caller should reuse it and not run), or None
+        """
+        requested_at = datetime.now(timezone.utc).isoformat()
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                last = load_json(self.status_path)
+                yield last if last and last['finished_at'] > requested_at else None
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def record(self, result: Any = None) -> None:
+        """
+        Record a completed run; call while holding the lock
+
+        Args:
+            result: JSON-serializable summary handed to runs that waited on this one
+        """
+        save_json(self.status_path, {
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'result': result
+        })